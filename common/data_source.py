@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from datetime import datetime
+
+# 数据源模式，通过环境变量设置：
+#   live   直接请求线上接口（默认）
+#   record 请求线上接口，同时把返回结果保存到本地
+#   replay 只从本地读取之前保存的结果，不访问网络
+DATA_SOURCE_MODE_ENV = 'DATA_SOURCE_MODE'
+# 录制文件目录，默认为 <project>/resource/recordings
+DATA_SOURCE_DIR_ENV = 'DATA_SOURCE_DIR'
+
+LIVE = 'live'
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+class ReplayMissing(Exception):
+    """回放模式下没有找到对应请求的录制数据"""
+
+
+class RecordedResponse:
+    """回放的HTTP响应，提供与requests.Response相同的常用接口"""
+
+    def __init__(self, status_code, text, url=None):
+        self.status_code = status_code
+        self.text = text
+        self.url = url
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}: {self.url}")
+
+
+def encode_response(response):
+    return {'status_code': response.status_code, 'text': response.text, 'url': response.url}
+
+
+def decode_response(payload):
+    return RecordedResponse(payload['status_code'], payload['text'], payload.get('url'))
+
+
+class RecordedResultData:
+    """
+    回放的baostock查询结果，提供与baostock ResultData相同的读取接口：
+    data 为当前页（回放时只有一页）的全部行，cur_row_num 为当前页已读取的行数
+    """
+
+    def __init__(self, error_code, error_msg, fields, rows):
+        self.error_code = error_code
+        self.error_msg = error_msg
+        self.fields = fields
+        self.data = rows
+        self.cur_row_num = 0
+
+    def next(self):
+        return self.cur_row_num < len(self.data)
+
+    def get_row_data(self):
+        row = self.data[self.cur_row_num]
+        self.cur_row_num += 1
+        return row
+
+
+def read_baostock_rows(rs):
+    """
+    按页读出baostock查询结果的全部行
+
+    ResultData.data 保存当前页的全部行，整页取出后把当前页标记为已读完，next() 会请求下一页，
+    不需要逐行调用 next() / get_row_data()。
+    """
+    rows = []
+    while rs.error_code == '0' and rs.data:
+        rows.extend(rs.data[rs.cur_row_num:])
+        rs.cur_row_num = len(rs.data)
+        if not rs.next():
+            break
+    return rows
+
+
+def encode_baostock_result(rs):
+    """读出baostock查询结果的全部行，登录/登出等没有数据的结果只保存错误码"""
+    rows = []
+    if getattr(rs, 'fields', None) is not None:
+        rows = read_baostock_rows(rs)
+    return {'error_code': rs.error_code, 'error_msg': rs.error_msg, 'fields': getattr(rs, 'fields', None), 'rows': rows}
+
+
+def decode_baostock_result(payload):
+    return RecordedResultData(payload['error_code'], payload['error_msg'], payload['fields'], payload['rows'])
+
+
+class DataSource:
+    """
+    外部数据接口的录制/回放层
+
+    每次调用按 (接口名, 参数) 生成唯一的键，录制模式下把结果保存为 <root>/<接口名>/<键>.pkl，
+    回放模式下直接读取，不访问网络，从而可以离线、可重复地运行整个流程。
+    录制时还会保存录制开始的时间，回放时 now() 返回该时间，保证按当前日期计算的请求参数与录制时一致。
+    """
+
+    def __init__(self, mode=None, root=None):
+        if root is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            root = os.environ.get(DATA_SOURCE_DIR_ENV) or os.path.join(project_root, 'resource', 'recordings')
+        self.mode = mode or os.environ.get(DATA_SOURCE_MODE_ENV, LIVE)
+        if self.mode not in (LIVE, RECORD, REPLAY):
+            raise ValueError(f"未知的数据源模式: {self.mode}")
+        self.root = root
+        self.session_path = os.path.join(root, 'session.json')
+        self._now = None
+
+        if self.mode == RECORD:
+            os.makedirs(root, exist_ok=True)
+            if not os.path.exists(self.session_path):
+                with open(self.session_path, 'w', encoding='utf-8') as f:
+                    json.dump({'now': datetime.now().isoformat()}, f)
+        if self.mode != LIVE and os.path.exists(self.session_path):
+            with open(self.session_path, 'r', encoding='utf-8') as f:
+                self._now = datetime.fromisoformat(json.load(f)['now'])
+
+    def now(self):
+        """当前时间，录制和回放时为录制开始的时间"""
+        if self.mode == REPLAY and self._now is None:
+            raise ReplayMissing(f"回放数据不存在: {self.session_path}")
+        return self._now or datetime.now()
+
+    def _path(self, api_name, args, kwargs):
+        key = json.dumps([args, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, api_name, f"{digest}.pkl")
+
+    def call(self, api_name, func, *args, encode=None, decode=None, **kwargs):
+        """
+        调用接口
+
+        参数：
+            api_name: 接口名，用于区分录制目录，例如 'tushare.pro_bar'
+            func: 实际的接口函数
+            encode: 把返回结果转为可保存的数据，例如一次读出baostock的全部行，默认直接保存
+            decode: 把保存的数据还原为与接口相同的返回对象，默认直接返回
+        异常：
+            回放模式下没有录制数据时抛出ReplayMissing
+        """
+        if self.mode == LIVE:
+            return func(*args, **kwargs)
+
+        path = self._path(api_name, list(args), kwargs)
+        if self.mode == REPLAY:
+            if not os.path.exists(path):
+                raise ReplayMissing(f"回放数据不存在: {api_name} {args} {kwargs}")
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+            return decode(payload) if decode else payload
+
+        result = func(*args, **kwargs)
+        payload = encode(result) if encode else result
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        # encode可能已经消耗了原始结果（例如baostock的逐行读取），返回还原后的对象
+        return decode(payload) if encode else result
+
+    def wrap(self, api_name, func, encode=None, decode=None):
+        """返回经过录制/回放层的接口函数，调用方式与原函数相同"""
+
+        def wrapper(*args, **kwargs):
+            return self.call(api_name, func, *args, encode=encode, decode=decode, **kwargs)
+
+        return wrapper
+
+
+# 全局共享的数据源，模式由环境变量决定
+data_source = DataSource()
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时分布统计的桶上界（毫秒），最后一个桶为无穷大
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf'))
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Metrics:
+    """
+    线程安全的运行指标收集器：
+        - 阶段耗时：timer(stage) / observe(stage, seconds)，报告中给出次数、总耗时、分位数和耗时分布
+        - 计数器：incr(name, n)，例如重试次数、检测命中次数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counters = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._counters = {}
+            self.started_at = time.time()
+            self._start = time.perf_counter()
+
+    def observe(self, stage, seconds):
+        """记录一次阶段耗时（秒）"""
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """统计代码块耗时，异常退出时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def count(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def export_raw(self):
+        """导出原始数据，用于在子进程中收集后合并到主进程"""
+        with self._lock:
+            return {'samples': {stage: list(values) for stage, values in self._samples.items()},
+                    'counters': dict(self._counters)}
+
+    def merge(self, raw):
+        """合并 export_raw 导出的数据"""
+        with self._lock:
+            for stage, values in raw['samples'].items():
+                self._samples.setdefault(stage, []).extend(values)
+            for name, n in raw['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def report(self):
+        """
+        汇总报告
+
+        返回：
+            {'started_at', 'elapsed', 'stages': {stage: {...}}, 'counters': {...}}
+        """
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            counters = dict(self._counters)
+
+        stages = {}
+        for stage, values in samples.items():
+            buckets = [0] * len(HISTOGRAM_BUCKETS_MS)
+            for value in values:
+                ms = value * 1000
+                for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+                    if ms <= bound:
+                        buckets[i] += 1
+                        break
+            total = sum(values)
+            stages[stage] = {
+                'count': len(values),
+                'total': total,
+                'mean': total / len(values) if values else 0.0,
+                'p50': _percentile(values, 0.5),
+                'p90': _percentile(values, 0.9),
+                'p99': _percentile(values, 0.99),
+                'max': values[-1] if values else 0.0,
+                'histogram_ms': {('inf' if bound == float('inf') else str(bound)): n
+                                 for bound, n in zip(HISTOGRAM_BUCKETS_MS, buckets)},
+            }
+        return {'started_at': self.started_at, 'elapsed': self.elapsed(), 'stages': stages, 'counters': counters}
+
+    def save(self, path, extra=None):
+        """将报告写入JSON文件，extra为附加的汇总信息"""
+        report = self.report()
+        if extra:
+            report.update(extra)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+def print_report(report):
+    """在控制台输出指标报告"""
+    print(f"运行耗时: {report['elapsed']:.1f}秒")
+    for key in ('stocks_processed', 'stocks_per_second'):
+        if key in report:
+            print(f"{key}: {report[key]:.2f}" if isinstance(report[key], float) else f"{key}: {report[key]}")
+    print(f"{'阶段':<40}{'次数':>8}{'总耗时(s)':>12}{'平均(ms)':>10}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'最大(ms)':>10}")
+    for stage, s in sorted(report['stages'].items(), key=lambda item: -item[1]['total']):
+        print(f"{stage:<40}{s['count']:>8}{s['total']:>12.2f}{s['mean'] * 1000:>10.2f}{s['p50'] * 1000:>10.2f}"
+              f"{s['p90'] * 1000:>10.2f}{s['p99'] * 1000:>10.2f}{s['max'] * 1000:>10.2f}")
+    for name, n in sorted(report['counters'].items()):
+        print(f"{name}: {n}")
+    for name, rate in report.get('hit_rates', {}).items():
+        print(f"命中率 {name}: {rate:.2%}")
+
+
+# 全局共享的指标收集器
+metrics = Metrics()
@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+
+from common.metrics import metrics
+
+# 错误类型
+RATE_LIMIT = 'rate_limit'  # 触发接口频率限制，需要等待一段时间后重试
+PERMANENT = 'permanent'  # 权限、积分、参数等错误，重试没有意义
+TRANSIENT = 'transient'  # 网络超时、连接中断等临时错误
+
+# tushare 返回的完整错误信息片段。错误信息中可能带有股票代码，不能按数字（如429）匹配
+RATE_LIMIT_KEYWORDS = ('每分钟最多访问该接口', '每小时最多访问该接口', 'too many requests')
+# 只有权限和额度错误是永久错误
+PERMANENT_KEYWORDS = ('没有访问该接口的权限', '每天最多访问该接口', '您的token不对', '积分不足')
+
+# HTTP接口表示频率限制的状态码
+RATE_LIMIT_STATUS = 429
+
+
+class DeadlineExceeded(Exception):
+    """整个运行的时间预算已用完"""
+
+
+class EmptyResult(Exception):
+    """接口没有返回数据，例如 pro_bar 内部出错时只返回None，按临时错误重试"""
+
+
+def classify_error(error):
+    """
+    根据异常信息判断错误类型
+
+    返回：
+        RATE_LIMIT / PERMANENT / TRANSIENT
+    """
+    # requests 的 HTTPError 带有响应，按状态码判断
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == RATE_LIMIT_STATUS:
+        return RATE_LIMIT
+    message = str(error).lower()
+    if any(keyword.lower() in message for keyword in RATE_LIMIT_KEYWORDS):
+        return RATE_LIMIT
+    if any(keyword.lower() in message for keyword in PERMANENT_KEYWORDS):
+        return PERMANENT
+    return TRANSIENT
+
+
+class RetryPolicy:
+    """
+    有上限的指数退避重试策略，等待时间加入随机抖动，避免大量请求同时重试
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=30.0, rate_limit_delay=20.0, call_deadline=120.0):
+        """
+        参数：
+            max_attempts: 最多尝试次数（包含第一次调用）
+            base_delay: 第一次重试的基础等待秒数
+            max_delay: 单次等待的最大秒数
+            rate_limit_delay: 触发频率限制时的最小等待秒数
+            call_deadline: 单次调用（含所有重试）的最长耗时秒数，None表示不限制
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+        self.call_deadline = call_deadline
+
+    def backoff(self, attempt, error_type=TRANSIENT):
+        """第attempt次失败后的等待秒数（attempt从1开始），使用full jitter"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if error_type == RATE_LIMIT:
+            delay = max(delay, self.rate_limit_delay * random.uniform(1.0, 1.5))
+        return delay
+
+
+class RunBudget:
+    """
+    整个运行的时间预算，所有调用共享，到期后不再发起新的重试
+    """
+
+    def __init__(self, seconds=None):
+        self.deadline = None
+        self.start(seconds)
+
+    def start(self, seconds=None):
+        """从现在开始计时，seconds为None表示不限制"""
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self):
+        """剩余秒数，不限制时返回None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+class CircuitBreaker:
+    """
+    所有请求共享的熔断器：连续失败达到阈值后打开，冷却期内所有调用统一等待，
+    冷却结束后放行请求试探，成功则恢复，失败则再次打开。
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        with self._lock:
+            return time.monotonic() < self._open_until
+
+    def wait_until_closed(self, budget=None):
+        """熔断器打开时阻塞到冷却结束，超过运行预算时抛出DeadlineExceeded"""
+        while True:
+            with self._lock:
+                wait_time = self._open_until - time.monotonic()
+            if wait_time <= 0:
+                return
+            if budget is not None and budget.remaining() is not None and budget.remaining() < wait_time:
+                raise DeadlineExceeded("熔断冷却时间超过剩余运行预算")
+            time.sleep(wait_time)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold and time.monotonic() >= self._open_until:
+                self._open_until = time.monotonic() + self.cooldown
+                # 冷却结束后重新计数，试探请求再次失败达到阈值才会重新打开
+                self._failures = 0
+                print(f"连续失败{self.failure_threshold}次，暂停所有请求{self.cooldown}秒")
+
+
+def call_with_policy(api_func, policy, breaker=None, budget=None, limiter=None, **kwargs):
+    """
+    按重试策略调用接口
+
+    参数：
+        api_func: 要调用的接口函数
+        policy: RetryPolicy
+        breaker: 共享的CircuitBreaker，可选
+        budget: 共享的RunBudget，可选
+        limiter: 共享的限流器，每次调用前获取令牌，可选
+        kwargs: 传给api_func的参数
+    异常：
+        永久错误、重试次数用尽或单次调用超时时抛出最后一次的异常，运行预算用完时抛出DeadlineExceeded
+    """
+    call_deadline = time.monotonic() + policy.call_deadline if policy.call_deadline is not None else None
+    attempt = 0
+    while True:
+        if budget is not None and budget.expired():
+            raise DeadlineExceeded("运行时间预算已用完")
+        if breaker is not None:
+            breaker.wait_until_closed(budget)
+        if limiter is not None:
+            metrics.observe('rate_limit_wait', limiter.acquire())
+
+        attempt += 1
+        metrics.incr('api.calls')
+        try:
+            result = api_func(**kwargs)
+        except Exception as e:
+            error_type = classify_error(e)
+            metrics.incr(f'api.errors.{error_type}')
+            if isinstance(e, EmptyResult):
+                metrics.incr('api.errors.empty')
+            print(f"调用失败[{error_type}]，第{attempt}次：{e}")
+            if error_type == PERMANENT:
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt >= policy.max_attempts:
+                raise
+
+            wait_time = policy.backoff(attempt, error_type)
+            if call_deadline is not None and time.monotonic() + wait_time > call_deadline:
+                # 单次调用超时只放弃当前调用，抛出最后一次的异常
+                raise
+            if budget is not None and budget.remaining() is not None and budget.remaining() < wait_time:
+                raise DeadlineExceeded("运行时间预算已用完") from e
+            metrics.incr('api.retries')
+            with metrics.timer('retry_sleep'):
+                time.sleep(wait_time)
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return result
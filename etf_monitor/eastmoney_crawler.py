@@ -1,15 +1,329 @@
+import os
+import threading
+import time
+
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 from datetime import datetime, timedelta
 import json
 
+from common.data_source import data_source, encode_response, decode_response
+from common.metrics import metrics
+
+# 东方财富clist接口的证券范围：ETF、沪深A股
+ETF_FS = "b:MK0021,b:MK0022,b:MK0023,b:MK0024"
+STOCK_FS = "m:0+t:6+f:!2,m:0+t:13+f:!2,m:0+t:80+f:!2,m:1+t:2+f:!2,m:1+t:23+f:!2"
+
+# 分钟周期对应的分钟数
+PERIOD_MINUTES = {'1min': 1, '5min': 5, '15min': 15, '30min': 30, '60min': 60, '120min': 120}
+# 交易时段：上午 9:30-11:30，下午 13:00-15:00，共240分钟
+MORNING_OPEN = 9 * 60 + 30
+MORNING_CLOSE = 11 * 60 + 30
+AFTERNOON_OPEN = 13 * 60
+SESSION_MINUTES = 240
+
+
+def session_labels(trade_time, minutes):
+    """
+    计算分钟K线所属的更大周期K线的时间标签
+
+    东方财富的分钟K线以结束时间标记，周期从开盘起按交易分钟划分，跳过午间休市，
+    例如60分钟K线为 10:30、11:30、14:00、15:00，120分钟K线为 11:30、15:00。
+
+    参数：
+        trade_time: 分钟K线的时间序列，格式 YYYY-MM-DD HH:MM
+        minutes: 目标周期的分钟数
+    返回：
+        与trade_time等长的时间标签，格式相同
+    """
+    times = pd.to_datetime(pd.Series(trade_time).reset_index(drop=True))
+    minute_of_day = (times.dt.hour * 60 + times.dt.minute).to_numpy()
+    # 距开盘的交易分钟数，下午接着上午的120分钟计算
+    elapsed = np.where(minute_of_day <= MORNING_CLOSE, minute_of_day - MORNING_OPEN,
+                       minute_of_day - AFTERNOON_OPEN + MORNING_CLOSE - MORNING_OPEN)
+    # 9:30的集合竞价K线并入第一根K线
+    bucket_end = np.clip(np.ceil(elapsed / minutes), 1, None) * minutes
+    bucket_end = np.minimum(bucket_end, SESSION_MINUTES)
+    label_minute = np.where(bucket_end <= MORNING_CLOSE - MORNING_OPEN, MORNING_OPEN + bucket_end,
+                            AFTERNOON_OPEN + bucket_end - (MORNING_CLOSE - MORNING_OPEN))
+    labels = times.dt.normalize() + pd.to_timedelta(label_minute, unit='min')
+    return labels.dt.strftime('%Y-%m-%d %H:%M')
+
+
+def resample_bars(df, minutes):
+    """
+    将分钟K线按交易时段合成为更大周期的K线，午间休市前后的K线不会合并到一起
+
+    参数：
+        df: get_minute_data 返回的分钟K线，周期需能整除minutes
+        minutes: 目标周期的分钟数
+    """
+    if df is None or df.empty:
+        return df
+    df = df.sort_values('trade_time').reset_index(drop=True)
+    labels = session_labels(df['trade_time'], minutes)
+    return df.groupby(labels.to_numpy(), sort=False).agg({
+        'open': 'first',
+        'close': 'last',
+        'high': 'max',
+        'low': 'min',
+        'vol': 'sum',
+        'amount': 'sum'
+    }).rename_axis('trade_time').reset_index()
+
+
+class MarketTable:
+    """
+    证券代码到市场代码（1-上海，0-深圳）的对照表，保存在本地JSON文件中，查询不需要访问网络。
+
+    文件格式：{"updated": 最后一次整体刷新的时间戳, "markets": {证券代码: 市场代码}}
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            path = os.path.join(project_root, 'resource', 'eastmoney_markets.json')
+        self.path = path
+        self._lock = threading.Lock()
+        self.updated = 0
+        self._markets = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self.updated = saved.get('updated', 0)
+            self._markets = saved.get('markets', {})
+
+    def __len__(self):
+        return len(self._markets)
+
+    def get(self, symbol):
+        return self._markets.get(symbol)
+
+    def add(self, symbol, market_id):
+        """记录单个证券的市场代码，例如列表中没有、通过K线接口确认的证券"""
+        with self._lock:
+            self._markets[symbol] = market_id
+            self._save()
+
+    def replace(self, markets):
+        """用一次完整的列表更新对照表，列表中没有的已知证券保留"""
+        with self._lock:
+            self._markets = {**self._markets, **markets}
+            self.updated = time.time()
+            self._save()
+
+    def is_stale(self, max_age):
+        return time.time() - self.updated > max_age
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated': self.updated, 'markets': self._markets}, f)
+        os.replace(tmp_path, self.path)
+
+
+class MinuteBarCache:
+    """
+    按(证券, 周期)缓存的分钟K线，每次只请求缓存中最后一根K线所在交易日之后的数据。
+
+    最后一根K线可能还没有走完，合并时新数据覆盖相同时间的旧K线。
+    缓存覆盖的起始日期记录在 index.json 中，请求的起始日期更早时重新获取全部数据。
+
+    目录结构：
+        <root>/<证券>_<周期>.parquet  trade_time, open, close, high, low, vol, amount, amplitude
+        <root>/index.json             {"<证券>_<周期>": 缓存覆盖的起始日期}
+    """
+
+    def __init__(self, root=None):
+        if root is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            root = os.path.join(project_root, 'resource', 'minute_bars')
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        self._lock = threading.Lock()
+        self._index = None
+        self._bars = {}
+
+    def _load_index(self):
+        if self._index is None:
+            self._index = {}
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+
+    def get(self, symbol, period, start_date):
+        """
+        返回缓存的K线，缓存不覆盖start_date时返回None
+        """
+        key = f"{symbol}_{period}"
+        with self._lock:
+            self._load_index()
+            covered = self._index.get(key)
+            if covered is None or covered > start_date:
+                return None
+            if key not in self._bars:
+                path = os.path.join(self.root, f"{key}.parquet")
+                if not os.path.exists(path):
+                    return None
+                self._bars[key] = pd.read_parquet(path)
+            return self._bars[key]
+
+    def put(self, symbol, period, start_date, df):
+        """保存start_date之后的K线"""
+        key = f"{symbol}_{period}"
+        df = df[trade_dates(df) >= start_date].reset_index(drop=True)
+        with self._lock:
+            self._load_index()
+            os.makedirs(self.root, exist_ok=True)
+            path = os.path.join(self.root, f"{key}.parquet")
+            df.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+            self._bars[key] = df
+            self._index[key] = start_date
+            with open(self.index_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(self.index_path + '.tmp', self.index_path)
+        return df
+
+
+def trade_dates(df):
+    """分钟K线的交易日，格式YYYYMMDD"""
+    return df['trade_time'].str[:10].str.replace('-', '', regex=False)
+
+
 class EastMoneyAPI:
-    """东方财富数据接口封装"""
-    
-    def __init__(self):
+    """
+    东方财富数据接口封装
+
+    所有请求共用一个保持长连接的Session，每个主机的连接数有上限，连接和读取都有超时，
+    避免每次请求重新握手，也避免某个请求卡住整个调度循环。每个接口的耗时记入 metrics 的 eastmoney.<接口名>。
+    """
+
+    # 默认的连接超时和读取超时（秒）
+    CONNECT_TIMEOUT = 3.05
+    READ_TIMEOUT = 10
+    # 市场对照表的刷新间隔（秒）
+    MARKET_REFRESH_INTERVAL = 24 * 3600
+    # clist接口每页的条数
+    LISTING_PAGE_SIZE = 5000
+    # 15/30/60/120分钟K线都由15分钟K线合成，每只证券每个监控周期只请求一次
+    BASE_PERIOD = '15min'
+    # 基础K线的缓存时间（秒），同一时刻触发的各周期任务共用一次请求
+    BASE_TTL = 60
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, pool_connections=4,
+                 pool_maxsize=8, market_table=None, bar_cache=None):
+        """
+        参数：
+            connect_timeout: 建立连接的超时（秒）
+            read_timeout: 等待响应数据的超时（秒）
+            pool_connections: 缓存连接池的主机数
+            pool_maxsize: 每个主机最多同时保持的连接数，并发请求超过时等待空闲连接
+            market_table: 证券代码到市场代码的对照表，默认为 resource/eastmoney_markets.json
+            bar_cache: 分钟K线缓存，默认为 resource/minute_bars
+        """
+        self.bar_cache = bar_cache if bar_cache is not None else MinuteBarCache()
+        self.markets = market_table if market_table is not None else MarketTable()
+        self._base_lock = threading.Lock()
+        self._base_bars = {}
+        self._refresh_stop = threading.Event()
+        self._refresh_thread = None
         self.headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36",
+            # 响应按gzip压缩传输，由requests自动解压
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
         }
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get(self, api_name, url, params):
+        """发送GET请求，经过数据源层，支持录制和回放"""
+        with metrics.timer(f'eastmoney.{api_name}'):
+            return data_source.call(f'eastmoney.{api_name}', self.session.get, url, params=params,
+                                    timeout=self.timeout, encode=encode_response, decode=decode_response)
+
+    def latency_report(self):
+        """各接口的耗时统计：{接口名: {count, mean, p50, p90, p99, max, ...}}，单位秒"""
+        return {stage[len('eastmoney.'):]: stats for stage, stats in metrics.report()['stages'].items()
+                if stage.startswith('eastmoney.')}
+
+    def close(self):
+        self.stop_market_refresh()
+        self.session.close()
+
+    def fetch_market_listing(self):
+        """
+        分页获取沪深A股和ETF的完整列表
+
+        返回：
+            {证券代码: 市场代码}
+        """
+        url = "http://push2.eastmoney.com/api/qt/clist/get"
+        markets = {}
+        page = 1
+        while True:
+            params = {
+                "pn": str(page),
+                "pz": str(self.LISTING_PAGE_SIZE),
+                "po": "1",
+                "np": "1",
+                "fltt": "2",
+                "invt": "2",
+                "fid": "f3",
+                "fs": f"{ETF_FS},{STOCK_FS}",
+                "fields": "f12,f13"
+            }
+            data = self._get('clist', url, params).json().get('data') or {}
+            items = data.get('diff') or []
+            for item in items:
+                markets[item['f12']] = str(item['f13'])
+            # 服务器每页返回的条数可能少于请求的条数，直到没有数据或达到总数为止
+            if not items or len(markets) >= data.get('total', 0):
+                return markets
+            page += 1
+
+    def refresh_markets(self):
+        """重新获取完整列表并更新市场对照表"""
+        markets = self.fetch_market_listing()
+        if not markets:
+            # 不能用空列表把对照表标记为已刷新
+            raise Exception("东方财富证券列表为空")
+        self.markets.replace(markets)
+        print(f"市场对照表已更新，共{len(self.markets)}个证券")
+
+    def start_market_refresh(self, interval=MARKET_REFRESH_INTERVAL):
+        """
+        启动后台线程定期刷新市场对照表，对照表过期时立即刷新一次
+        """
+        if self._refresh_thread is not None:
+            return
+
+        def run():
+            while not self._refresh_stop.is_set():
+                if self.markets.is_stale(interval):
+                    try:
+                        self.refresh_markets()
+                    except Exception as e:
+                        print(f"刷新市场对照表失败：{str(e)}")
+                # 失败后也等待一段时间再重试，避免频繁请求
+                self._refresh_stop.wait(min(interval, 600))
+
+        self._refresh_thread = threading.Thread(target=run, name='eastmoney-market-refresh', daemon=True)
+        self._refresh_thread.start()
+
+    def stop_market_refresh(self):
+        self._refresh_stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=5)
+            self._refresh_thread = None
         
     def get_market_id(self, symbol, security_type='ETF'):
         """
@@ -29,37 +343,19 @@ class EastMoneyAPI:
             elif symbol.startswith(('00', '30', '15', '16', '12', '39')):
                 return '0', f"0.{symbol}"
             
-            # 如果通过前缀无法判断，则尝试通过API查询
-            print(f"无法通过代码前缀判断 {symbol} 的市场，尝试通过API查询...")
-            
-            url = "http://push2.eastmoney.com/api/qt/clist/get"
-            
-            if security_type == 'ETF':
-                fs = "b:MK0021,b:MK0022,b:MK0023,b:MK0024"
-            else:
-                fs = "m:0+t:6+f:!2,m:0+t:13+f:!2,m:0+t:80+f:!2,m:1+t:2+f:!2,m:1+t:23+f:!2"
-            
-            params = {
-                "pn": "1",
-                "pz": "10000",
-                "po": "1",
-                "np": "1",
-                "fltt": "2",
-                "invt": "2",
-                "fid": "f3",
-                "fs": fs,
-                "fields": "f12,f13,f14"
-            }
-            
-            response = requests.get(url, params=params, headers=self.headers)
-            data = response.json()
-            
-            if 'data' in data and 'diff' in data['data']:
-                for item in data['data']['diff']:
-                    if item['f12'] == symbol:
-                        return item['f13'], f"{item['f13']}.{symbol}"
-            
-            # 如果在列表中未找到，则依次尝试沪深市场
+            # 通过前缀无法判断时查本地的市场对照表，对照表为空时先获取一次完整列表
+            market_id = self.markets.get(symbol)
+            if market_id is None and not len(self.markets):
+                print(f"无法通过代码前缀判断 {symbol} 的市场，获取市场对照表...")
+                try:
+                    self.refresh_markets()
+                except Exception as e:
+                    print(f"获取市场对照表失败：{str(e)}")
+                market_id = self.markets.get(symbol)
+            if market_id is not None:
+                return market_id, f"{market_id}.{symbol}"
+
+            # 如果在对照表中未找到，则依次尝试沪深市场，确认后记入对照表
             for market_id in ['1', '0']:
                 test_url = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
                 test_params = {
@@ -72,10 +368,11 @@ class EastMoneyAPI:
                     "end": "20500101",
                 }
                 
-                response = requests.get(test_url, params=test_params, headers=self.headers)
+                response = self._get('kline', test_url, test_params)
                 data = response.json()
                 
-                if 'data' in data and data['data']['klines']:
+                if data.get('data') and data['data']['klines']:
+                    self.markets.add(symbol, market_id)
                     return market_id, f"{market_id}.{symbol}"
                     
             print(f"未找到 {symbol} 的市场信息")
@@ -101,7 +398,7 @@ class EastMoneyAPI:
             url = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
             params = {
                 "fields1": "f1,f2,f3,f4,f5,f6,f7,f8",
-                "fields2": "f51,f52,f53,f54,f55,f56,f57,f58",
+                "fields2": "f51,f52,f53,f54,f55,f56,f57,f58,f61",
                 "klt": "101",  # 日线
                 "fqt": "1",    # 前复权
                 "secid": f"{market_id}.{code}",
@@ -109,7 +406,7 @@ class EastMoneyAPI:
                 "end": end_date if end_date else "20500101",
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self._get('kline', url, params)
             data = response.json()
             
             if 'data' not in data or not data['data']['klines']:
@@ -120,12 +417,12 @@ class EastMoneyAPI:
             rows = [line.split(',') for line in klines]
             df = pd.DataFrame(rows, columns=[
                 'trade_date', 'open', 'close', 'high', 'low',
-                'vol', 'amount', 'amplitude'
+                'vol', 'amount', 'amplitude', 'turnover_rate'
             ])
             
             # 转换数据类型
-            for col in ['open', 'close', 'high', 'low', 'vol', 'amount']:
-                df[col] = pd.to_numeric(df[col])
+            for col in ['open', 'close', 'high', 'low', 'vol', 'amount', 'turnover_rate']:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
                 
             return df
         except Exception as e:
@@ -162,13 +459,13 @@ class EastMoneyAPI:
                 "end": end_date if end_date else "20500101",
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self._get('kline', url, params)
             data = response.json()
             
             if 'data' not in data or not data['data']['klines']:
                 # 尝试沪市代码
                 params['secid'] = f"1.{symbol}"
-                response = requests.get(url, params=params, headers=self.headers)
+                response = self._get('kline', url, params)
                 data = response.json()
                 
                 if 'data' not in data or not data['data']['klines']:
@@ -193,21 +490,97 @@ class EastMoneyAPI:
             
     def merge_60min_to_120min(self, symbol, start_date=None, end_date=None):
         """合并60分钟数据为120分钟数据"""
-        df = self.get_minute_data(symbol, '60min', start_date, end_date)
+        return resample_bars(self.get_minute_data(symbol, '60min', start_date, end_date), 120)
+
+    def get_cached_minute_data(self, symbol, period, start_date, end_date=None):
+        """
+        与 get_minute_data 相同，但只从缓存中最后一根K线所在的交易日开始请求，与缓存合并后返回
+
+        参数：
+            start_date: 开始日期，格式YYYYMMDD，为空时不使用缓存
+            end_date: 结束日期，为空或不早于缓存中的最后一个交易日时才请求新数据
+        """
+        if start_date is None:
+            return self.get_minute_data(symbol, period, start_date, end_date)
+        cached = self.bar_cache.get(symbol, period, start_date)
+        if cached is None or cached.empty:
+            df = self.get_minute_data(symbol, period, start_date, end_date)
+            if df is None or df.empty:
+                return df
+            return self.bar_cache.put(symbol, period, start_date, df)
+
+        last_date = trade_dates(cached.iloc[-1:]).iloc[0]
+        if end_date is None or end_date >= last_date:
+            # 从最后一根K线所在的交易日开始请求，覆盖可能还没有走完的K线
+            new = self.get_minute_data(symbol, period, last_date, end_date)
+            if new is None or new.empty:
+                # 请求失败时使用缓存中已有的K线
+                print(f"获取 {symbol} {period} 新增K线失败，使用缓存的数据")
+            elif not self._overlap_matches(cached, new):
+                # 前复权价格在除权除息后整体重算，缓存中的历史价格不再可用，重新获取全部K线
+                print(f"{symbol} {period} 的复权价格已变化或无法核对，重新获取全部K线")
+                df = self.get_minute_data(symbol, period, start_date, end_date)
+                if df is None or df.empty:
+                    return None
+                return self.bar_cache.put(symbol, period, start_date, df)
+            else:
+                merged = pd.concat([cached, new], ignore_index=True)
+                merged = merged.drop_duplicates('trade_time', keep='last').sort_values('trade_time')
+                cached = self.bar_cache.put(symbol, period, start_date, merged)
+        dates = trade_dates(cached)
+        mask = dates >= start_date
+        if end_date is not None:
+            mask &= dates <= end_date
+        return cached[mask].reset_index(drop=True)
+
+    @staticmethod
+    def _overlap_matches(cached, new):
+        """
+        新获取的K线与缓存中已走完的K线（不含最后一根）在重叠部分的价格是否一致，
+        没有重叠的已走完K线时（例如缓存的最后一根是当天第一根K线）无法确认，按不一致处理
+        """
+        overlap = cached.iloc[:-1].merge(new, on='trade_time', suffixes=('_cached', ''))
+        if overlap.empty:
+            return False
+        return all(np.allclose(overlap[f'{col}_cached'].to_numpy(dtype=float), overlap[col].to_numpy(dtype=float))
+                   for col in ('open', 'close', 'high', 'low'))
+
+    def get_base_data(self, symbol, start_date=None, end_date=None):
+        """
+        获取基础周期的分钟K线，BASE_TTL 秒内相同参数的请求直接返回上次的结果
+        """
+        key = (symbol, start_date, end_date)
+        now = time.monotonic()
+        with self._base_lock:
+            cached = self._base_bars.get(key)
+            if cached is not None and now - cached[0] < self.BASE_TTL:
+                return cached[1]
+        df = self.get_cached_minute_data(symbol, self.BASE_PERIOD, start_date, end_date)
         if df is not None and not df.empty:
-            df = df.sort_values('trade_time')
-            df['group'] = df.index // 2
-            df = df.groupby('group').agg({
-                'trade_time': 'first',
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'vol': 'sum',
-                'amount': 'sum'
-            }).reset_index(drop=True)
+            with self._base_lock:
+                # 只保留未过期的缓存
+                self._base_bars = {k: v for k, v in self._base_bars.items() if now - v[0] < self.BASE_TTL}
+                self._base_bars[key] = (now, df)
         return df
 
+    def get_period_data(self, symbol, period, start_date=None, end_date=None):
+        """
+        获取分钟周期的K线：能由基础周期合成的周期在本地合成，其余周期直接请求
+
+        参数：
+            period: 1min/5min/15min/30min/60min/120min
+        """
+        minutes = PERIOD_MINUTES.get(period)
+        base_minutes = PERIOD_MINUTES[self.BASE_PERIOD]
+        if minutes is None or minutes < base_minutes or minutes % base_minutes:
+            return self.get_cached_minute_data(symbol, period, start_date, end_date)
+        df = self.get_base_data(symbol, start_date, end_date)
+        if df is None or df.empty:
+            return df
+        if minutes == base_minutes:
+            return df.copy()
+        return resample_bars(df, minutes)
+
 if __name__ == '__main__':
     api = EastMoneyAPI()
     
@@ -3,12 +3,10 @@ from datetime import datetime, timedelta
 
 import schedule
 
-from eastmoney_crawler import EastMoneyAPI
+from common.data_source import data_source
 from common.log_utils import LoggerManager
-from ma_monitor import get_ma_data, check_ma_cross
-
-# 初始化东方财富API
-api = EastMoneyAPI()
+# 与均线监控共用同一个东方财富API实例，复用连接池
+from ma_monitor import api, indicators, get_ma_data, check_ma_cross
 
 def monitor_symbol(symbol_code, symbol_name=None, period=None):
     """
@@ -40,8 +38,8 @@ def monitor_symbol(symbol_code, symbol_name=None, period=None):
         return
 
     # 计算三个月前的日期
-    start_date = (datetime.today() - timedelta(days=90)).strftime('%Y%m%d')
-    end_date = datetime.today().strftime('%Y%m%d')
+    start_date = (data_source.now() - timedelta(days=90)).strftime('%Y%m%d')
+    end_date = data_source.now().strftime('%Y%m%d')
     logger.info(f"获取从 {start_date} 到 {end_date} 的数据")
     
     # 监控指定周期
@@ -58,6 +56,14 @@ def monitor_symbol(symbol_code, symbol_name=None, period=None):
             logger.info(f"{symbol_code} ({symbol_name}) 在 {period_name} 周期当前价格位于三条均线{status}")
         else:
             logger.warning(f"无法获取 {symbol_code} ({symbol_name}) 的 {p} 周期数据")
+
+    # 保存增量指标的状态，重启后不需要从头计算
+    indicators.save()
+
+    # 记录东方财富各接口的累计耗时
+    for endpoint, stats in api.latency_report().items():
+        logger.info(f"接口 {endpoint}: {stats['count']}次, 平均{stats['mean'] * 1000:.0f}ms, "
+                    f"p90 {stats['p90'] * 1000:.0f}ms, 最大{stats['max'] * 1000:.0f}ms")
     
     logger.info(f"========== 监控完成 ==========\n")
 
@@ -162,12 +168,16 @@ def start_scheduler():
     """
     # 获取主日志记录器
     main_logger = LoggerManager.get_logger('main')
+    # 后台定期刷新市场对照表，监控任务查询市场时不再访问网络
+    api.start_market_refresh()
     try:
         while True:
             schedule.run_pending()
             time.sleep(1)
     except KeyboardInterrupt:
         main_logger.info("所有监控已停止")
+    finally:
+        api.stop_market_refresh()
 
 
 if __name__ == '__main__':
@@ -1,12 +1,16 @@
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import timedelta
 from eastmoney_crawler import EastMoneyAPI
 from gui_utils import NotificationManager
+from streaming_indicators import IndicatorStore
+from common.data_source import data_source
 from common.log_utils import LoggerManager
 
 # 初始化东方财富API
 api = EastMoneyAPI()
 notify = NotificationManager()
+# 各证券各周期的增量均线和MACD状态
+indicators = IndicatorStore()
 
 def get_ma_data(ts_code, period='D', start_date=None, end_date=None, ts_name=None):
     """
@@ -16,11 +20,15 @@ def get_ma_data(ts_code, period='D', start_date=None, end_date=None, ts_name=Non
         ts_code: ETF代码
         period: 周期，支持：
             - 1min/5min/15min/30min/60min - 分钟
-            - 120min - 2小时（由60分钟数据合并得到）
+            - 120min - 2小时（与30/60分钟一样由15分钟数据按交易时段合成）
             - D - 日线
         start_date: 开始日期
         end_date: 结束日期
         ts_name: ETF中文名称
+    返回：
+        按时间升序的K线，获取失败时返回 None。
+        MA10/MA30/MA60 和 DIF/DEA/MACD 只在最后两行有值（K线数量不足的均线除外），
+        其余各行均为 NaN，需要完整指标序列的调用方应自行按 close 计算
     """
     # 如果没有提供中文名称，使用代码作为名称
     if ts_name is None:
@@ -30,9 +38,9 @@ def get_ma_data(ts_code, period='D', start_date=None, end_date=None, ts_name=Non
     logger = LoggerManager.get_logger(f"{ts_code}_{ts_name}")
     
     if start_date is None:
-        start_date = (datetime.today() - timedelta(days=120)).strftime('%Y%m%d')
+        start_date = (data_source.now() - timedelta(days=120)).strftime('%Y%m%d')
     if end_date is None:
-        end_date = datetime.today().strftime('%Y%m%d')
+        end_date = data_source.now().strftime('%Y%m%d')
     
     # 提取纯代码（去掉可能的后缀如.SZ）
     symbol = ts_code.split('.')[0]
@@ -40,23 +48,28 @@ def get_ma_data(ts_code, period='D', start_date=None, end_date=None, ts_name=Non
     try:
         if period == 'D':
             df = api.get_daily_data(symbol, start_date, end_date)
-        elif period == '120min':
-            # 调用合并60分钟数据的函数
-            df = api.merge_60min_to_120min(symbol, start_date, end_date)
         else:
-            df = api.get_minute_data(symbol, period, start_date, end_date)
+            # 15/30/60/120分钟由同一份15分钟K线合成
+            df = api.get_period_data(symbol, period, start_date, end_date)
             
         if df is None or df.empty:
             return None
             
         # 按时间正序排列
-        df = df.sort_values('trade_date' if period == 'D' else 'trade_time')
-        
-        # 计算移动平均线
-        df['MA10'] = df['close'].rolling(window=10).mean()
-        df['MA30'] = df['close'].rolling(window=30).mean()
-        df['MA60'] = df['close'].rolling(window=60).mean()
-        
+        time_col = 'trade_date' if period == 'D' else 'trade_time'
+        df = df.sort_values(time_col).reset_index(drop=True)
+
+        # 增量更新均线和MACD，只计算上次之后的新K线，结果写入最后两行（check_ma_cross只用到这两行）
+        engine = indicators.feed(symbol, period, df[time_col].to_numpy(dtype=object), df['close'].to_numpy())
+        rows = [(len(df) - 1, engine.values())]
+        if len(df) >= 2 and engine.last_time == str(df[time_col].iloc[-2]):
+            rows.append((len(df) - 2, engine.closed_values))
+        for col in ['MA10', 'MA30', 'MA60', 'DIF', 'DEA', 'MACD']:
+            df[col] = float('nan')
+            for i, values in rows:
+                if values and values[col] is not None:
+                    df.loc[i, col] = values[col]
+
         return df
     except Exception as e:
         logger.error(f"获取数据失败：{str(e)}")
@@ -174,6 +187,8 @@ def monitor_etf(ts_code, period='D', ts_name=None):
         ts_code: ETF代码
         period: 周期，支持 1min/5min/15min/30min/60min/D
         ts_name: ETF中文名称
+    返回：
+        当前价格是否在 MA10/MA30/MA60 三条均线上方，均线数据不足或获取数据失败时返回 False
     """
     # 如果没有提供中文名称，使用代码作为名称
     if ts_name is None:
@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+from collections import deque
+
+# 监控使用的均线周期
+MA_WINDOWS = (10, 30, 60)
+# MACD参数：快线、慢线、信号线
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+
+
+def _ema(previous, value, span):
+    """与 pandas ewm(span, adjust=False) 相同的递推，第一个值作为初始值"""
+    if previous is None:
+        return value
+    alpha = 2 / (span + 1)
+    return previous + alpha * (value - previous)
+
+
+class StreamingIndicators:
+    """
+    单个(证券, 周期)的增量指标：MA10/MA30/MA60 和 MACD。
+
+    已经走完的K线计入滚动和与EMA状态，最后一根K线（可能还没有走完）只参与计算、不改变状态，
+    同一根K线的价格变化时重复 update 即可。每次更新的计算量与历史长度无关。
+    """
+
+    def __init__(self, windows=MA_WINDOWS):
+        self.windows = tuple(windows)
+        # 已走完的K线：最近max(windows)个收盘价、各均线的滚动和、最后一根的时间
+        self._closes = deque(maxlen=max(self.windows))
+        self._sums = {window: 0.0 for window in self.windows}
+        self.last_time = None
+        self.last_close = None
+        # 已走完K线的EMA状态
+        self._ema_fast = None
+        self._ema_slow = None
+        self._dea = None
+        # 最后一根K线
+        self.live_time = None
+        self.live_close = None
+        # 最后一根已走完K线上的指标值
+        self.closed_values = None
+
+    def _commit(self, trade_time, close):
+        """将一根走完的K线计入状态"""
+        self.closed_values = self._compute(close, commit=True)
+        for window in self.windows:
+            self._sums[window] += close
+            if len(self._closes) >= window:
+                self._sums[window] -= self._closes[-window]
+        self._closes.append(close)
+        self.last_time = trade_time
+        self.last_close = close
+
+    def _compute(self, close, commit=False):
+        """以close作为最新一根K线计算各指标"""
+        values = {}
+        for window in self.windows:
+            if len(self._closes) < window - 1:
+                values[f'MA{window}'] = None
+                continue
+            total = self._sums[window] - (self._closes[-window] if len(self._closes) >= window else 0.0)
+            values[f'MA{window}'] = (total + close) / window
+
+        ema_fast = _ema(self._ema_fast, close, MACD_FAST)
+        ema_slow = _ema(self._ema_slow, close, MACD_SLOW)
+        dif = ema_fast - ema_slow
+        dea = _ema(self._dea, dif, MACD_SIGNAL)
+        values.update(DIF=dif, DEA=dea, MACD=2 * (dif - dea))
+        if commit:
+            self._ema_fast, self._ema_slow, self._dea = ema_fast, ema_slow, dea
+        return values
+
+    def update(self, trade_time, close):
+        """
+        输入最新一根K线的时间和收盘价。时间比上一根新时，上一根K线视为已经走完
+
+        返回：
+            最新一根K线上的 {MA10, MA30, MA60, DIF, DEA, MACD}，K线数量不足的均线为None
+        """
+        if self.live_time is not None and trade_time < self.live_time:
+            raise ValueError(f"K线时间 {trade_time} 早于最新的K线 {self.live_time}")
+        if self.live_time is not None and trade_time > self.live_time:
+            self._commit(self.live_time, self.live_close)
+        self.live_time = trade_time
+        self.live_close = float(close)
+        return self.values()
+
+    def values(self):
+        if self.live_time is None:
+            return None
+        return self._compute(self.live_close)
+
+    def snapshot(self):
+        """导出可JSON序列化的状态"""
+        return {
+            'windows': list(self.windows),
+            'closes': list(self._closes),
+            'sums': {str(window): total for window, total in self._sums.items()},
+            'last_time': self.last_time,
+            'last_close': self.last_close,
+            'ema': [self._ema_fast, self._ema_slow, self._dea],
+            'live': [self.live_time, self.live_close],
+            'closed_values': self.closed_values,
+        }
+
+    @classmethod
+    def restore(cls, state):
+        engine = cls(state['windows'])
+        engine._closes.extend(state['closes'])
+        engine._sums = {int(window): total for window, total in state['sums'].items()}
+        engine.last_time = state['last_time']
+        engine.last_close = state.get('last_close')
+        engine._ema_fast, engine._ema_slow, engine._dea = state['ema']
+        engine.live_time, engine.live_close = state['live']
+        engine.closed_values = state['closed_values']
+        return engine
+
+
+class IndicatorStore:
+    """
+    所有(证券, 周期)的增量指标，可以保存到 resource/indicator_state.json，重启后继续使用
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            path = os.path.join(project_root, 'resource', 'indicator_state.json')
+        self.path = path
+        self._lock = threading.Lock()
+        self._engines = None
+
+    def _load(self):
+        if self._engines is not None:
+            return
+        self._engines = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for key, state in json.load(f).items():
+                    self._engines[key] = StreamingIndicators.restore(state)
+
+    def feed(self, symbol, period, times, closes):
+        """
+        用K线序列更新(证券, 周期)的指标，只处理状态中最后一根K线之后的部分。
+        状态不存在、与K线序列接不上（例如中间缺少K线），或最后一根已走完K线的收盘价与序列中不同
+        （前复权价格在除权除息后整体重算）时，用全部K线重新建立状态。
+
+        参数：
+            times: 按时间升序的K线时间
+            closes: 对应的收盘价
+        返回：
+            StreamingIndicators
+        """
+        key = f"{symbol}_{period}"
+        with self._lock:
+            self._load()
+            engine = self._engines.get(key)
+            start = 0
+            if engine is not None and engine.live_time is not None and len(times):
+                # 状态中最后一根K线在序列中的位置，从这一根开始更新
+                start = _search(times, engine.live_time)
+                if start is None or not _same_close(engine, times, closes, start):
+                    engine = None
+                    start = 0
+            if engine is None:
+                engine = StreamingIndicators()
+                self._engines[key] = engine
+            for i in range(start, len(times)):
+                engine.update(times[i], closes[i])
+            return engine
+
+    def save(self):
+        with self._lock:
+            if self._engines is None:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({key: engine.snapshot() for key, engine in self._engines.items()}, f)
+            os.replace(tmp_path, self.path)
+
+
+def _same_close(engine, times, closes, live_index):
+    """状态中最后一根已走完K线的收盘价与序列中的是否一致，live_index为状态中最后一根K线在序列中的位置"""
+    if engine.last_time is None:
+        return True
+    previous = live_index - 1
+    if previous < 0 or times[previous] != engine.last_time or engine.last_close is None:
+        return False
+    return abs(float(closes[previous]) - engine.last_close) <= 1e-9 * max(1.0, abs(engine.last_close))
+
+
+def _search(times, trade_time):
+    """从后向前查找trade_time在序列中的位置，不在序列中时返回None"""
+    for i in range(len(times) - 1, -1, -1):
+        if times[i] == trade_time:
+            return i
+        if times[i] < trade_time:
+            return None
+    return None
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+
+class BarStore:
+    """
+    本地日线数据存储，每只股票一个parquet列式文件，另有一个索引文件记录每只股票的最后交易日和同步进度。
+
+    目录结构：
+        <root>/daily/<ts_code>.parquet  按trade_date升序保存的日线数据
+        <root>/index.json               {ts_code: {"last_trade_date", "synced_from", "synced_to"}}
+    """
+
+    # 索引累计多少次修改后自动落盘一次
+    FLUSH_EVERY = 200
+
+    def __init__(self, root=None):
+        if root is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            root = os.path.join(project_root, 'resource', 'bar_store')
+        self.root = root
+        self.daily_dir = os.path.join(root, 'daily')
+        self.index_path = os.path.join(root, 'index.json')
+        os.makedirs(self.daily_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._index = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _partition_path(self, ts_code):
+        return os.path.join(self.daily_dir, f"{ts_code}.parquet")
+
+    def get_entry(self, ts_code):
+        """返回该股票的索引信息，未缓存过时返回None"""
+        with self._lock:
+            entry = self._index.get(ts_code)
+            return dict(entry) if entry else None
+
+    def last_trade_date(self, ts_code):
+        entry = self.get_entry(ts_code)
+        return entry['last_trade_date'] if entry else None
+
+    def read(self, ts_code, start_date=None, end_date=None):
+        """
+        读取本地日线数据
+
+        参数：
+            ts_code: 股票代码
+            start_date: 起始交易日（含），格式YYYYMMDD
+            end_date: 结束交易日（含），格式YYYYMMDD
+        返回：
+            按trade_date升序排列的DataFrame，本地没有数据时返回None
+        """
+        path = self._partition_path(ts_code)
+        if not os.path.exists(path):
+            return None
+        df = pd.read_parquet(path)
+        if start_date is not None:
+            df = df[df['trade_date'] >= start_date]
+        if end_date is not None:
+            df = df[df['trade_date'] <= end_date]
+        return df.reset_index(drop=True)
+
+    def append(self, ts_code, new_data, synced_from, synced_to):
+        """
+        将新获取的日线数据合并进本地存储，并更新索引
+
+        参数：
+            ts_code: 股票代码
+            new_data: 新获取的数据，可以为空
+            synced_from: 本地数据覆盖的起始日期
+            synced_to: 本次同步已经确认完整的截止日期
+        """
+        path = self._partition_path(ts_code)
+        old_data = pd.read_parquet(path) if os.path.exists(path) else None
+
+        frames = [df for df in (old_data, new_data) if df is not None and not df.empty]
+        if frames:
+            merged = pd.concat(frames, ignore_index=True)
+            # 同一交易日以最新获取的数据为准
+            merged = merged.drop_duplicates(subset='trade_date', keep='last')
+            merged = merged.sort_values(by='trade_date', ascending=True).reset_index(drop=True)
+            tmp_path = path + '.tmp'
+            merged.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            last_trade_date = merged['trade_date'].iloc[-1]
+        else:
+            last_trade_date = None
+
+        with self._lock:
+            self._index[ts_code] = {
+                'last_trade_date': last_trade_date,
+                'synced_from': synced_from,
+                'synced_to': synced_to,
+            }
+            self._dirty += 1
+            need_flush = self._dirty >= self.FLUSH_EVERY
+
+        if need_flush:
+            self.flush()
+
+    def flush(self):
+        """将索引写回磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = 0
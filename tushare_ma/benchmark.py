@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# 添加项目根目录到sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import detectors
+from panel_screen import screen_stocks
+from synthetic_bars import generate_universe
+
+# 吞吐量低于历史基准的比例超过该阈值时判定为性能回退
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+
+def detector_functions():
+    """检测引擎中所有的检测函数"""
+    return [func for name, func in vars(detectors).items()
+            if name.startswith('is_') and callable(func) and hasattr(func, 'features')]
+
+
+def _best_of(repeat, func):
+    """重复执行取最短耗时，减少偶发抖动的影响"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(stocks=500, days=90, seed=0, repeat=5):
+    """
+    在合成数据上测量各检测函数和整体筛选的吞吐量
+
+    返回：
+        {名称: 每秒处理的股票数}
+    """
+    universe, frames = generate_universe(stocks=stocks, days=days, seed=seed)
+    results = {}
+
+    for func in detector_functions():
+        elapsed = _best_of(repeat, lambda: [func(df) for df in frames])
+        results[func.__name__] = stocks / elapsed
+
+    # 与 daily_check 相同的检测流程，不包含数据获取
+    elapsed = _best_of(repeat, lambda: [detectors.evaluate_detectors(df) for df in frames])
+    results['evaluate_detectors'] = stocks / elapsed
+
+    # 面板引擎一次筛选全部股票
+    elapsed = _best_of(repeat, lambda: screen_stocks(universe, frames))
+    results['screen_panel'] = stocks / elapsed
+    return results
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def find_regressions(results, history, params, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    与相同参数下最近一次记录比较
+
+    返回：
+        [(名称, 基准吞吐量, 当前吞吐量), ...]，吞吐量下降超过threshold的项
+    """
+    baseline = next((record['results'] for record in reversed(history) if record['params'] == params), None)
+    if baseline is None:
+        return []
+    return [(name, baseline[name], value) for name, value in results.items()
+            if name in baseline and value < baseline[name] * (1 - threshold)]
+
+
+if __name__ == '__main__':
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description='在合成数据上测量检测函数的性能')
+    parser.add_argument('--stocks', type=int, default=500, help='合成股票数量')
+    parser.add_argument('--days', type=int, default=90, help='每只股票的交易日数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复次数，取最短耗时')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='吞吐量下降超过该比例时返回失败')
+    parser.add_argument('--history', default=os.path.join(project_root, 'resource', 'benchmark_history.json'),
+                        help='历史结果文件')
+    parser.add_argument('--no-save', action='store_true', help='不写入历史结果')
+    args = parser.parse_args()
+
+    params = {'stocks': args.stocks, 'days': args.days, 'seed': args.seed}
+    results = run_benchmarks(stocks=args.stocks, days=args.days, seed=args.seed, repeat=args.repeat)
+    history = load_history(args.history)
+    regressions = find_regressions(results, history, params, args.threshold)
+
+    for name, value in results.items():
+        print(f"{name:<40}{value:>12.1f} 只/秒")
+
+    # 出现回退时不写入历史，避免回退后的结果成为新的基准
+    if not args.no_save and not regressions:
+        history.append({'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'params': params, 'results': results})
+        save_history(args.history, history)
+
+    if regressions:
+        for name, baseline, value in regressions:
+            print(f"性能回退: {name} {baseline:.1f} -> {value:.1f} 只/秒 ({value / baseline - 1:.1%})")
+        sys.exit(1)
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+import detectors
+from common.StockEnum import StockStatus
+from common.metrics import metrics
+from detectors import MIN_DAILY_BARS, screen_bars
+
+CREATE_MEMO_SQL = """
+CREATE TABLE IF NOT EXISTS detector_memo (
+    ts_code TEXT NOT NULL,
+    source TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    first_date TEXT NOT NULL,
+    last_date TEXT NOT NULL,
+    bars INTEGER NOT NULL,
+    last_bar TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    statuses TEXT NOT NULL,
+    PRIMARY KEY (ts_code, source, engine)
+)
+"""
+
+# 检测逻辑所在的源文件：逐只检测、面板引擎和多进程引擎
+FINGERPRINT_FILES = ('detectors.py', 'indicators.py', 'panel_screen.py', 'parallel_screen.py')
+
+# 参与最后一根K线摘要的字段
+LAST_BAR_FIELDS = ('open', 'high', 'low', 'close', 'vol', 'amount')
+
+
+def detectors_fingerprint():
+    """
+    检测逻辑的指纹：各筛选引擎的检测函数和指标计算的源码，以及 DETECTORS 中的参数。
+    修改任何阈值、参数或检测逻辑后指纹都会变化，之前缓存的结果全部失效。
+    """
+    digest = hashlib.sha1()
+    module_dir = os.path.dirname(os.path.abspath(detectors.__file__))
+    for file_name in FINGERPRINT_FILES:
+        with open(os.path.join(module_dir, file_name), 'rb') as f:
+            digest.update(f.read())
+    digest.update(repr([(status.name, func.__name__, sorted(kwargs.items()))
+                        for status, func, kwargs in detectors.DETECTORS]).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def bars_key(daily_data):
+    """
+    日线数据的标识：(第一个交易日, 最后一个交易日, K线数量, 最后一根K线的摘要)，没有数据时返回None。
+    摘要由最后一根K线的价格和成交量计算，盘中还没有走完的K线或不同数据源的K线数值变化时缓存失效
+    """
+    if daily_data is None or len(daily_data) == 0:
+        return None
+    trade_dates = daily_data['trade_date'].astype(str)
+    fields = [col for col in LAST_BAR_FIELDS if col in daily_data.columns]
+    last = daily_data[fields].iloc[trade_dates.reset_index(drop=True).idxmax()]
+    last_bar = hashlib.sha1(repr([float(value) for value in last.tolist()]).encode('utf-8')).hexdigest()[:16]
+    return trade_dates.min(), trade_dates.max(), len(daily_data), last_bar
+
+
+class DetectorMemo:
+    """
+    检测结果的持久化缓存，保存在SQLite中，每只股票每个数据源每个筛选引擎一行。
+    各引擎在浮点数边界上的结果可能不同，不共用缓存。
+
+    日线数据的区间、K线数量和最后一根K线、检测逻辑的指纹都与缓存相同时直接返回缓存的结果，
+    当天重复运行或停牌没有新K线的股票不再重新计算，只有出现新K线或修改了检测参数的股票才重新检测。
+    新的结果先缓存在内存中，flush() 时批量写入。
+    """
+
+    def __init__(self, db_path=None, fingerprint=None):
+        if db_path is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            db_path = os.path.join(project_root, 'resource', 'detector_memo.db')
+        self.db_path = db_path
+        self.fingerprint = fingerprint or detectors_fingerprint()
+        self.enabled = True
+
+        self._lock = threading.Lock()
+        self._entries = None
+        self._pending = {}
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(detector_memo)")]
+        if columns and not {'last_bar', 'engine'} <= set(columns):
+            # 旧版本的缓存没有最后一根K线的摘要或筛选引擎，直接丢弃
+            with conn:
+                conn.execute("DROP TABLE detector_memo")
+        conn.execute(CREATE_MEMO_SQL)
+        return conn
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                # 检测逻辑变化后旧的结果不再有用
+                conn.execute("DELETE FROM detector_memo WHERE fingerprint != ?", (self.fingerprint,))
+            rows = conn.execute(
+                "SELECT ts_code, source, engine, first_date, last_date, bars, last_bar, statuses FROM detector_memo")
+            self._entries = {(ts_code, source, engine): ((first_date, last_date, bars, last_bar), statuses)
+                             for ts_code, source, engine, first_date, last_date, bars, last_bar, statuses in rows}
+        finally:
+            conn.close()
+
+    def get(self, ts_code, source, daily_data, engine='daily'):
+        """
+        返回缓存的检测结果，没有缓存或数据已经变化时返回None
+
+        参数：
+            engine: 筛选引擎 daily / panel / parallel
+        """
+        key = bars_key(daily_data)
+        if not self.enabled or key is None:
+            return None
+        with self._lock:
+            self._load()
+            entry = self._entries.get((ts_code, source, engine))
+        if entry is None or entry[0] != key:
+            metrics.incr('memo.miss')
+            return None
+        metrics.incr('memo.hit')
+        return [StockStatus[name] for name in entry[1].split(',')]
+
+    def put(self, ts_code, source, daily_data, statuses, engine='daily'):
+        key = bars_key(daily_data)
+        if not self.enabled or key is None:
+            return
+        entry = (key, ','.join(status.name for status in statuses))
+        with self._lock:
+            self._load()
+            self._entries[(ts_code, source, engine)] = entry
+            self._pending[(ts_code, source, engine)] = entry
+
+    def screen(self, ts_code, source, daily_data):
+        """
+        与 detectors.screen_bars 相同，命中缓存时不再执行检测
+
+        返回：
+            (结果列表, 按trade_date升序的日线数据)
+        """
+        if daily_data is None or len(daily_data) < MIN_DAILY_BARS:
+            return screen_bars(daily_data)
+        cached = self.get(ts_code, source, daily_data)
+        if cached is not None:
+            return cached, daily_data.sort_values(by='trade_date', ascending=True).reset_index(drop=True)
+        res, daily_data = screen_bars(daily_data)
+        self.put(ts_code, source, daily_data, res)
+        return res, daily_data
+
+    def flush(self):
+        """将新的检测结果写入SQLite"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO detector_memo "
+                    "(ts_code, source, engine, first_date, last_date, bars, last_bar, fingerprint, statuses) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(ts_code, source, engine, first_date, last_date, bars, last_bar, self.fingerprint, statuses)
+                     for (ts_code, source, engine), ((first_date, last_date, bars, last_bar), statuses)
+                     in pending.items()])
+        finally:
+            conn.close()
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+def _quarter_of(date):
+    """YYYYMMDD -> (年, 季度)"""
+    return int(date[:4]), (int(date[4:6]) - 1) // 3 + 1
+
+
+def _quarters_between(start, end):
+    """[start, end]之间的季度，均为(年, 季度)，升序"""
+    year, quarter = start
+    while (year, quarter) <= end:
+        yield year, quarter
+        year, quarter = (year + 1, 1) if quarter == 4 else (year, quarter + 1)
+
+
+class FloatShareTable:
+    """
+    本地缓存的流通股本表，用于由成交量计算换手率。
+
+    流通股本来自 baostock 季频盈利能力数据的 liqaShare，按报告期(statDate)记录，只保存发生变化的记录，
+    查询某个交易日的流通股本时取该日之前最近一次的值（point-in-time），该日早于第一条记录时取第一条。
+    每只股票超过 REFRESH_DAYS 天没有刷新时，才查询上次记录之后新增的报告期。
+
+    目录结构：
+        <root>/float_share.parquet  ts_code, stat_date, float_share（股）
+        <root>/index.json           {ts_code: {"refreshed", "stat_date"}}，最后刷新日期和已查询到的最新报告期
+    """
+
+    # 每只股票的刷新间隔（天）
+    REFRESH_DAYS = 7
+    # 第一次刷新时向前查询的季度数，覆盖日线的获取区间
+    HISTORY_QUARTERS = 4
+    # 累计多少次修改后自动落盘一次
+    FLUSH_EVERY = 200
+
+    def __init__(self, root=None, query=None):
+        """
+        参数：
+            root: 存储目录，默认为 <project>/resource/float_share
+            query: baostock查询函数 query(api_name, **kwargs)，返回(fields, rows)
+        """
+        if root is None:
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            root = os.path.join(project_root, 'resource', 'float_share')
+        self.root = root
+        self.table_path = os.path.join(root, 'float_share.parquet')
+        self.index_path = os.path.join(root, 'index.json')
+        self.query = query
+
+        # 在进程池的工作进程中关闭自动落盘，由主进程合并后统一写入
+        self.auto_flush = True
+
+        self._lock = threading.RLock()
+        self._dirty = 0
+        self._index = None
+        # {ts_code: (stat_date数组, float_share数组)}，按stat_date升序
+        self._table = None
+
+    def _load(self):
+        if self._table is not None:
+            return
+        self._index = {}
+        self._table = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+        if os.path.exists(self.table_path):
+            df = pd.read_parquet(self.table_path).sort_values(['ts_code', 'stat_date'])
+            for ts_code, group in df.groupby('ts_code', sort=False):
+                self._table[ts_code] = (group['stat_date'].to_numpy(dtype=str),
+                                        group['float_share'].to_numpy(dtype=float))
+
+    def is_fresh(self, ts_code, as_of):
+        with self._lock:
+            self._load()
+            entry = self._index.get(ts_code)
+            if entry is None:
+                return False
+            refreshed = datetime.strptime(entry['refreshed'], '%Y%m%d')
+            return datetime.strptime(as_of, '%Y%m%d') - refreshed < timedelta(days=self.REFRESH_DAYS)
+
+    def refresh(self, ts_code, code, as_of):
+        """
+        查询该股票上次记录之后的报告期，合并发生变化的流通股本
+
+        参数：
+            ts_code: 股票代码，tushare格式
+            code: baostock格式的股票代码，例如 sz.000001
+            as_of: 刷新日期，格式YYYYMMDD
+        """
+        with self._lock:
+            self._load()
+            entry = self._index.get(ts_code)
+        known_stat_date = entry.get('stat_date') if entry else None
+        if known_stat_date:
+            last_year, last_quarter = _quarter_of(known_stat_date)
+            first = (last_year + 1, 1) if last_quarter == 4 else (last_year, last_quarter + 1)
+        else:
+            year, quarter = _quarter_of(as_of)
+            index = year * 4 + quarter - 1 - (self.HISTORY_QUARTERS - 1)
+            first = (index // 4, index % 4 + 1)
+
+        reports = []
+        for year, quarter in _quarters_between(first, _quarter_of(as_of)):
+            fields, rows = self.query('query_profit_data', year=year, quarter=quarter, code=code)
+            if not rows:
+                continue
+            stat_index, share_index = fields.index('statDate'), fields.index('liqaShare')
+            for row in rows:
+                if row[share_index]:
+                    reports.append((row[stat_index].replace('-', ''), float(row[share_index])))
+
+        with self._lock:
+            self._merge(ts_code, reports)
+            stat_dates = [stat_date for stat_date, _ in reports] + ([known_stat_date] if known_stat_date else [])
+            self._index[ts_code] = {'refreshed': as_of, 'stat_date': max(stat_dates, default=None)}
+            self._dirty += 1
+            need_flush = self.auto_flush and self._dirty >= self.FLUSH_EVERY
+        if need_flush:
+            self.flush()
+
+    def _merge(self, ts_code, reports):
+        if not reports:
+            return
+        dates, values = self._table.get(ts_code, (np.array([], dtype=str), np.array([], dtype=float)))
+        merged = dict(zip(dates.tolist(), values.tolist()))
+        merged.update(reports)
+        # 只保留流通股本发生变化的记录
+        kept_dates, kept_values = [], []
+        for stat_date in sorted(merged):
+            if not kept_values or merged[stat_date] != kept_values[-1]:
+                kept_dates.append(stat_date)
+                kept_values.append(merged[stat_date])
+        self._table[ts_code] = (np.array(kept_dates, dtype=str), np.array(kept_values, dtype=float))
+
+    def ensure(self, ts_code, code, as_of):
+        """表中该股票的数据过期或不存在时刷新"""
+        if not self.is_fresh(ts_code, as_of):
+            self.refresh(ts_code, code, as_of)
+
+    def lookup(self, ts_code, trade_dates):
+        """
+        按交易日查询point-in-time的流通股本（股）
+
+        参数：
+            trade_dates: 交易日序列，格式YYYYMMDD
+        返回：
+            与trade_dates等长的数组，表中没有该股票时全部为NaN
+        """
+        with self._lock:
+            self._load()
+            entry = self._table.get(ts_code)
+        trade_dates = np.asarray(trade_dates, dtype=str)
+        if entry is None:
+            return np.full(len(trade_dates), np.nan)
+        dates, values = entry
+        positions = np.searchsorted(dates, trade_dates, side='right') - 1
+        return values[np.maximum(positions, 0)]
+
+    def export(self, ts_codes):
+        """
+        导出部分股票的表项，用于把工作进程中刷新的数据带回主进程
+
+        返回：
+            {ts_code: (索引信息, [stat_date, ...], [float_share, ...])}
+        """
+        with self._lock:
+            self._load()
+            entries = {}
+            for ts_code in ts_codes:
+                if ts_code in self._index:
+                    dates, values = self._table.get(ts_code, ((), ()))
+                    entries[ts_code] = (dict(self._index[ts_code]), list(dates), list(values))
+            return entries
+
+    def update(self, entries):
+        """合并 export 导出的表项，刷新日期更新的表项覆盖本地的表项"""
+        with self._lock:
+            self._load()
+            for ts_code, (entry, dates, values) in entries.items():
+                local = self._index.get(ts_code)
+                if local is not None and local['refreshed'] >= entry['refreshed']:
+                    continue
+                self._index[ts_code] = entry
+                if dates:
+                    self._table[ts_code] = (np.array(dates, dtype=str), np.array(values, dtype=float))
+                self._dirty += 1
+
+    def flush(self):
+        """将流通股本表和索引写回磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            rows = [(ts_code, stat_date, value) for ts_code, (dates, values) in self._table.items()
+                    for stat_date, value in zip(dates.tolist(), values.tolist())]
+            df = pd.DataFrame(rows, columns=['ts_code', 'stat_date', 'float_share'])
+            tmp_path = self.table_path + '.tmp'
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.table_path)
+
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = 0
@@ -0,0 +1,141 @@
+import inspect
+import re
+from functools import lru_cache
+
+# 指标命名规则，指标之间的依赖关系由名称推导出来：
+#   close/open/high/low/vol/amount/pct_chg  原始字段
+#   ma{n}                                   n日收盘价均线          依赖 close
+#   ema{n}                                  n日收盘价指数均线      依赖 close
+#   dif_{s}_{l}                             快慢线差值             依赖 ema{s}, ema{l}
+#   dea_{s}_{l}_{g}                         DIF的g日指数均线       依赖 dif_{s}_{l}
+#   hist_{s}_{l}_{g}                        DIF - DEA              依赖 dif_{s}_{l}, dea_{s}_{l}_{g}
+#   macd_{s}_{l}_{g}                        2 * (DIF - DEA)        依赖 hist_{s}_{l}_{g}
+_FEATURE_RULES = [
+    (re.compile(r'ma(\d+)'),
+     lambda n: ['close'],
+     lambda n: lambda close: close.rolling(window=int(n)).mean()),
+    (re.compile(r'ema(\d+)'),
+     lambda n: ['close'],
+     lambda n: lambda close: close.ewm(span=int(n), adjust=False).mean()),
+    (re.compile(r'dif_(\d+)_(\d+)'),
+     lambda s, l: [f'ema{s}', f'ema{l}'],
+     lambda s, l: lambda ema_short, ema_long: ema_short - ema_long),
+    (re.compile(r'dea_(\d+)_(\d+)_(\d+)'),
+     lambda s, l, g: [f'dif_{s}_{l}'],
+     lambda s, l, g: lambda dif: dif.ewm(span=int(g), adjust=False).mean()),
+    (re.compile(r'hist_(\d+)_(\d+)_(\d+)'),
+     lambda s, l, g: [f'dif_{s}_{l}', f'dea_{s}_{l}_{g}'],
+     lambda s, l, g: lambda dif, dea: dif - dea),
+    (re.compile(r'macd_(\d+)_(\d+)_(\d+)'),
+     lambda s, l, g: [f'hist_{s}_{l}_{g}'],
+     lambda s, l, g: lambda hist: 2 * hist),
+]
+
+# 原始字段的别名：ts.pro_bar(factors=['tor']) 返回的换手率字段为 tor
+_FIELD_ALIASES = {
+    'turnover_rate': ('tor',),
+}
+
+
+def macd_feature(short_window=12, long_window=26, signal_window=9, kind='macd'):
+    """返回MACD相关指标的名称，kind可选 dif/dea/hist/macd"""
+    if kind == 'dif':
+        return f'dif_{short_window}_{long_window}'
+    return f'{kind}_{short_window}_{long_window}_{signal_window}'
+
+
+def detector(*features, lookback=None):
+    """
+    声明检测函数依赖的指标，例如 @detector('ma5', 'ma10')
+    检测函数需要接受 ctx 参数，并通过 ctx.get(name) 获取指标。
+    evaluate_detectors 执行前按声明预先计算这些指标，缺少其中任一指标的数据不满足该检测
+
+    参数：
+        lookback: 检测需要的最少交易日数量，可以是整数，
+                  也可以是按参数计算的函数，例如 lambda p: p['days'] + p['reference_days']
+    """
+
+    def decorator(func):
+        func.features = features
+        func.lookback = lookback
+        return func
+
+    return decorator
+
+
+@lru_cache(maxsize=None)
+def _signature(func):
+    return inspect.signature(func)
+
+
+def required_bars(detector_func, kwargs=None, default=0):
+    """检测函数按给定参数（未给出的使用默认值）需要的最少交易日数量，没有声明时返回default"""
+    lookback = getattr(detector_func, 'lookback', None)
+    if lookback is None:
+        return default
+    if not callable(lookback):
+        return lookback
+    bound = _signature(detector_func).bind_partial(**(kwargs or {}))
+    bound.apply_defaults()
+    return lookback(bound.arguments)
+
+
+class IndicatorContext:
+    """
+    单只股票的指标计算上下文，每个指标和每个检测结果在同一只股票上只计算一次，
+    后续检测函数直接复用
+    """
+
+    def __init__(self, daily_data):
+        self.data = daily_data
+        self._features = {}
+        self._results = {}
+
+    def get(self, name):
+        """获取指标序列，首次访问时按依赖关系计算并缓存"""
+        if name not in self._features:
+            self._features[name] = self._compute(name)
+        return self._features[name]
+
+    def missing(self, names):
+        """names中无法从数据计算出来的指标，同时预先计算并缓存其余指标"""
+        result = []
+        for name in names:
+            try:
+                self.get(name)
+            except KeyError:
+                result.append(name)
+        return result
+
+    def _compute(self, name):
+        aliases = [alias for alias in _FIELD_ALIASES.get(name, ()) if alias in self.data.columns]
+        if name in self.data.columns:
+            series = self.data[name]
+            for alias in aliases:
+                series = series.fillna(self.data[alias])
+            return series
+        if aliases:
+            return self.data[aliases[0]]
+        for pattern, deps, compute in _FEATURE_RULES:
+            match = pattern.fullmatch(name)
+            if match:
+                args = match.groups()
+                return compute(*args)(*(self.get(dep) for dep in deps(*args)))
+        raise KeyError(f"未知的指标: {name}")
+
+    def call(self, detector_func, **kwargs):
+        """执行检测函数，相同参数的检测结果在同一只股票上只计算一次"""
+        bound = _signature(detector_func).bind(self.data, **kwargs)
+        bound.apply_defaults()
+        bound.arguments.pop('ctx', None)
+        key = (detector_func.__name__,) + tuple(list(bound.arguments.items())[1:])
+        if key not in self._results:
+            self._results[key] = detector_func(self.data, ctx=self, **kwargs)
+        return self._results[key]
+
+
+def get_context(daily_data, ctx=None):
+    """检测函数单独调用时没有传入上下文，则为这份数据新建一个"""
+    if ctx is not None and ctx.data is daily_data:
+        return ctx
+    return IndicatorContext(daily_data)
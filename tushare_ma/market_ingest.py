@@ -0,0 +1,115 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from common.data_source import data_source
+from tushare_check import pro, bar_store, call_with_retry, confirmed_end_date, get_trade_dates
+
+# 与 ts.pro_bar(factors=['tor', 'vr']) 返回的字段保持一致
+DAILY_BASIC_FIELDS = 'ts_code,trade_date,turnover_rate,volume_ratio'
+
+
+def _market_dates_path(store):
+    return os.path.join(store.root, 'market_dates.json')
+
+
+def load_ingested_dates(store=bar_store):
+    """读取已经按全市场方式导入过的交易日"""
+    path = _market_dates_path(store)
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(json.load(f))
+
+
+def save_ingested_dates(dates, store=bar_store):
+    path = _market_dates_path(store)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sorted(dates), f)
+    os.replace(tmp_path, path)
+
+
+def fetch_market_daily(trade_date):
+    """
+    获取某个交易日全市场的日线数据，并合并换手率和量比
+
+    返回的字段与 ts.pro_bar(factors=['tor', 'vr']) 相同：
+        ts_code, trade_date, open, high, low, close, pre_close, change, pct_chg, vol, amount,
+        turnover_rate, volume_ratio
+    """
+    daily = call_with_retry(data_source.wrap('tushare.daily', pro.daily), trade_date=trade_date)
+    basic = call_with_retry(data_source.wrap('tushare.daily_basic', pro.daily_basic),
+                            trade_date=trade_date, fields=DAILY_BASIC_FIELDS)
+    if daily is None or daily.empty:
+        return None
+    if basic is None or basic.empty:
+        basic = pd.DataFrame(columns=DAILY_BASIC_FIELDS.split(','))
+    return daily.merge(basic, on=['ts_code', 'trade_date'], how='left')
+
+
+def ingest_market(start_date, end_date, ts_codes=None, store=bar_store):
+    """
+    按交易日导入全市场日线数据，并拆分写入每只股票的本地存储。
+    首次运行约每个交易日2次调用（daily + daily_basic），之后每天只需导入新增的交易日。
+
+    参数：
+        start_date: 开始日期，格式YYYYMMDD
+        end_date: 结束日期，格式YYYYMMDD
+        ts_codes: 股票池，导入完成后这些股票都会被标记为已同步（停牌股票也不再单独请求）
+        store: 本地日线存储
+    """
+    end_date = confirmed_end_date(end_date)
+    ingested = load_ingested_dates(store)
+    trade_dates = get_trade_dates(start_date, end_date)
+    missing_dates = [d for d in trade_dates if d not in ingested]
+    print(f"全市场导入：共{len(trade_dates)}个交易日，需要导入{len(missing_dates)}个")
+
+    frames = []
+    fetched = set()
+    for trade_date in missing_dates:
+        print(f"导入交易日 {trade_date}")
+        try:
+            day_data = fetch_market_daily(trade_date)
+        except Exception as e:
+            print(f"导入交易日 {trade_date} 失败：{e}")
+            continue
+        if day_data is not None:
+            frames.append(day_data)
+            fetched.add(trade_date)
+
+    # 只确认到第一个没有导入成功的交易日之前，失败或尚未发布的交易日下次继续导入
+    done = ingested.union(fetched)
+    synced_to = (datetime.strptime(start_date, '%Y%m%d') - timedelta(days=1)).strftime('%Y%m%d')
+    for trade_date in trade_dates:
+        if trade_date not in done:
+            break
+        synced_to = trade_date
+    if synced_to < end_date:
+        print(f"部分交易日导入失败，同步进度只确认到 {synced_to}")
+
+    # 将按日期获取的数据转为按股票分组
+    grouped = {}
+    if frames:
+        market_data = pd.concat(frames, ignore_index=True)
+        grouped = dict(tuple(market_data.groupby('ts_code', sort=False)))
+
+    codes = set(grouped)
+    if ts_codes is not None:
+        codes.update(ts_codes)
+
+    for ts_code in codes:
+        entry = store.get_entry(ts_code)
+        new_data = grouped.get(ts_code)
+        if entry is None or entry['synced_from'] > start_date or entry['synced_to'] < start_date:
+            # 覆盖范围与本次导入不连续，以本次导入的区间为准
+            synced_from, stock_synced_to = start_date, synced_to
+        else:
+            # 单独获取过的股票可能已经同步到更晚的日期
+            synced_from, stock_synced_to = entry['synced_from'], max(entry['synced_to'], synced_to)
+        store.append(ts_code, new_data, synced_from=synced_from, synced_to=stock_synced_to)
+
+    store.flush()
+    save_ingested_dates(done, store)
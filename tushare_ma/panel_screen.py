@@ -0,0 +1,416 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from common.StockEnum import StockStatus
+from common.metrics import metrics
+from detectors import is_excluded, MIN_DAILY_BARS, DETECTORS
+
+# 面板中保存的字段
+PANEL_FIELDS = ('close', 'vol', 'amount', 'pct_chg', 'turnover_rate')
+
+# 面板最小宽度，保证各检测条件的切片窗口不越界
+MIN_PANEL_WIDTH = 100
+
+
+class Panel:
+    """
+    全市场日线面板：每个字段是一个 (股票数, 交易日数) 的二维数组。
+    每只股票的数据靠右对齐，最后一列是该股票最新的一根K线，左侧不足的部分用NaN填充，
+    这样 [:, -k:] 与单只股票 DataFrame 的 iloc[-k:] 含义相同（停牌日不占位置）。
+    """
+
+    def __init__(self, codes, lengths, fields):
+        self.codes = list(codes)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.fields = fields
+
+    def __getattr__(self, name):
+        fields = self.__dict__.get('fields', {})
+        if name in fields:
+            return fields[name]
+        raise AttributeError(name)
+
+    @property
+    def width(self):
+        return self.fields['close'].shape[1]
+
+    @classmethod
+    def from_frames(cls, codes, frames, width=None):
+        """
+        由每只股票的日线DataFrame构建面板
+
+        参数：
+            codes: 股票代码列表
+            frames: 与codes一一对应的日线数据（按trade_date升序），没有数据时为None
+            width: 面板宽度，默认为最长的数据长度
+        """
+        lengths = np.array([0 if df is None else len(df) for df in frames], dtype=np.int64)
+        if width is None:
+            width = max(MIN_PANEL_WIDTH, int(lengths.max(initial=0)))
+        fields = {name: np.full((len(codes), width), np.nan) for name in PANEL_FIELDS}
+
+        rows = [row for row, length in enumerate(lengths) if length]
+        if rows:
+            # 拼接成一张长表后按 (行, 列) 一次性写入面板，避免逐只股票赋值
+            stacked = pd.concat([frames[row] for row in rows], ignore_index=True, sort=False)
+            if 'tor' in stacked.columns:
+                # 没有turnover_rate字段的数据使用tor作为换手率
+                tor = stacked.pop('tor')
+                stacked['turnover_rate'] = stacked['turnover_rate'].fillna(tor) if 'turnover_rate' in stacked else tor
+            row_idx = np.repeat(rows, lengths[rows])
+            # 每只股票内部的位置，最新一根K线在最后一列
+            offsets = np.concatenate([np.arange(length) for length in lengths[rows]])
+            col_idx = width - lengths[row_idx] + offsets
+            # 数据长度超过面板宽度时只保留最近的部分
+            keep = col_idx >= 0
+            for name in PANEL_FIELDS:
+                if name in stacked.columns:
+                    values = stacked[name].to_numpy(dtype=np.float64)
+                    fields[name][row_idx[keep], col_idx[keep]] = values[keep]
+            lengths = np.minimum(lengths, width)
+        return cls(codes, lengths, fields)
+
+    def save(self, path):
+        """保存为npz文件，便于之后快速加载或内存映射"""
+        np.savez(path, codes=np.asarray(self.codes), lengths=self.lengths, **self.fields)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            fields = {name: data[name] for name in PANEL_FIELDS}
+            return cls(data['codes'].tolist(), data['lengths'], fields)
+
+
+def _mean(values):
+    """逐行求均值，窗口内有NaN时结果为NaN（与rolling().mean()一致）"""
+    return values.mean(axis=1)
+
+
+def _nanmean(values):
+    """逐行求均值并忽略NaN（与Series.mean()一致）"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return np.nanmean(values, axis=1)
+
+
+def _ema(values, span):
+    """逐行计算 ewm(span, adjust=False).mean()，每行从第一个有效值开始递推"""
+    alpha = 2.0 / (span + 1.0)
+    old_weight = 1.0 - alpha
+    # 与pandas的递推公式保持一致，保证结果逐位相同
+    denominator = old_weight + alpha
+    result = np.empty_like(values)
+    prev = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        current = values[:, t]
+        prev = np.where(np.isnan(prev), current, (old_weight * prev + alpha * current) / denominator)
+        result[:, t] = prev
+    return result
+
+
+def _macd(panel, short_window=12, long_window=26, signal_window=9):
+    dif = _ema(panel.close, short_window) - _ema(panel.close, long_window)
+    dea = _ema(dif, signal_window)
+    return 2 * (dif - dea)
+
+
+def _take(values, index):
+    """逐行取出index列的值"""
+    return np.take_along_axis(values, index[:, None], axis=1)[:, 0]
+
+
+def limit_up_3days(panel):
+    return (panel.lengths >= 3) & np.all(panel.pct_chg[:, -3:] >= 9.89, axis=1)
+
+
+def limit_up_only_3days(panel):
+    pct_chg = panel.pct_chg
+    earlier = np.any(pct_chg[:, -6:-3] >= 9.89, axis=1)
+    return limit_up_3days(panel) & ~earlier
+
+
+def rising_with_volume_increase(panel, days=3):
+    vol = panel.vol
+    result = (panel.lengths >= days) & np.all(panel.pct_chg[:, -days:] > 0, axis=1)
+    for i in range(1, days):
+        result &= vol[:, -i] >= vol[:, -i - 1] * 0.95
+    return result
+
+
+def volume_surge_with_price_rise(panel, days=3, reference_days=7, volume_multiplier=3, consecutive_rise_days=2):
+    vol, pct_chg = panel.vol, panel.pct_chg
+    reference_volume = _nanmean(vol[:, -(days + reference_days):-days])
+    count = np.zeros(len(vol), dtype=np.int64)
+    result = np.zeros(len(vol), dtype=bool)
+    for i in range(1, days + 1):
+        rise = (vol[:, -i] >= reference_volume * volume_multiplier) & (pct_chg[:, -i] > 0)
+        count = np.where(rise, count + 1, 0)
+        result |= count >= consecutive_rise_days
+    return (panel.lengths >= days + reference_days) & result
+
+
+def capital_inflow(panel, min_threshold=0.90, days=3, reference_days=7, volume_increase_threshold=1.2):
+    amount, pct_chg = panel.amount, panel.pct_chg
+    reference_avg_amount = _nanmean(amount[:, -(days + reference_days):-days])
+    recent_avg_amount = _nanmean(amount[:, -days:])
+    result = (panel.lengths >= days + reference_days)
+    result &= ~(recent_avg_amount < reference_avg_amount * volume_increase_threshold)
+    for i in range(1, days):
+        result &= (amount[:, -i] >= amount[:, -i - 1] * min_threshold) & (pct_chg[:, -i] > 0)
+    return result
+
+
+def stock_stabilizing(panel, days=5):
+    close, vol = panel.close, panel.vol
+    ma_crossover = _mean(close[:, -5:]) > _mean(close[:, -10:])
+
+    recent_prices = close[:, -days:]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        lowest_price = np.nanmin(recent_prices, axis=1)
+    last_close_price = recent_prices[:, -1]
+    price_rebound = (lowest_price * 1.02 <= last_close_price) & (last_close_price <= lowest_price * 1.07)
+
+    recent_volumes = vol[:, -days:]
+    volume_increase = np.ones(len(vol), dtype=bool)
+    for i in range(1, days):
+        volume_increase &= recent_volumes[:, -i] >= recent_volumes[:, -(i + 1)] * 0.90
+
+    return (panel.lengths >= 10) & price_rebound & volume_increase & ma_crossover
+
+
+def stock_stabilizing_over60(panel, days=5, tolerance=0.1):
+    close, vol = panel.close, panel.vol
+    last_close_price = close[:, -1]
+    last_ma60 = _mean(close[:, -60:])
+    result = (panel.lengths >= 60)
+    result &= ~(last_close_price <= last_ma60)
+    result &= ~(last_close_price > last_ma60 * (1 + tolerance))
+
+    recent_volumes = vol[:, -days:]
+    for i in range(1, days):
+        result &= recent_volumes[:, i] >= recent_volumes[:, i - 1] * 0.90
+    return result
+
+
+def macd_golden_cross(panel, days=3, long_window=26, macd=None):
+    if macd is None:
+        macd = _macd(panel, long_window=long_window)
+    result = np.zeros(len(macd), dtype=bool)
+    for i in range(1, days + 1):
+        result |= (macd[:, -i - 1] < 0) & (0 < macd[:, -i])
+    return (panel.lengths >= long_window) & result
+
+
+def double_bottom(panel, min_days_between=5, max_days_between=30):
+    close, vol = panel.close, panel.vol
+    rows, width = close.shape
+    columns = np.arange(width)[None, :]
+    valid_close = ~np.isnan(close)
+
+    # 最近90根K线的窗口
+    window_start = width - np.minimum(panel.lengths, 90)
+    in_window = columns >= window_start[:, None]
+
+    # 第一个低点
+    min1_idx = np.where(in_window & valid_close, close, np.inf).argmin(axis=1)
+    min1_price = _take(close, min1_idx)
+    min1_volume = _take(vol, min1_idx)
+
+    # 第一个低点后的反弹高点（颈线位置）
+    max_between_idx = np.where((columns > min1_idx[:, None]) & valid_close, close, -np.inf).argmax(axis=1)
+    neckline_price = _take(close, max_between_idx)
+
+    # 第二个低点
+    min2_idx = np.where((columns > max_between_idx[:, None]) & valid_close, close, np.inf).argmin(axis=1)
+    min2_price = _take(close, min2_idx)
+    min2_volume = _take(vol, min2_idx)
+
+    days_between = min2_idx - min1_idx
+    price_diff_percent = np.abs(min2_price - min1_price) / min1_price
+    result = (panel.lengths >= 30) & (min1_idx < width - 1) & (max_between_idx < width - 1)
+    result &= (min_days_between <= days_between) & (days_between <= max_days_between)
+    result &= price_diff_percent <= 0.05
+    result &= min2_volume < min1_volume
+    result &= min2_idx > max_between_idx
+    result &= neckline_price > min1_price * 1.05
+
+    # 突破颈线90%的第一根K线
+    breakout = (columns > min2_idx[:, None]) & (close >= (neckline_price * 0.9)[:, None])
+    has_breakout = breakout.any(axis=1)
+    breakout_volume = _take(vol, breakout.argmax(axis=1))
+
+    # 第二个低点前5根K线的平均成交量，不足5根时原实现的切片为空，结果为NaN
+    offsets = np.arange(-5, 0)[None, :]
+    avg_idx = np.clip(min2_idx[:, None] + offsets, 0, width - 1)
+    avg_volume = _nanmean(np.take_along_axis(vol, avg_idx, axis=1))
+    avg_volume = np.where(min2_idx - window_start >= 5, avg_volume, np.nan)
+
+    return result & has_breakout & (breakout_volume > avg_volume * 1.2)
+
+
+def double_bottom_new(panel, window=10, price_diff=0.05, min_days=5, max_days=30, volume_ratio=1.2, days=90):
+    close, vol = panel.close, panel.vol
+    rows, width = close.shape
+    columns = np.arange(width)
+    # 只在最近days根K线中查找
+    lengths = np.minimum(panel.lengths, days)
+    valid_start = width - lengths
+
+    # 1. 用滑动窗口找局部低点
+    bottoms = np.zeros_like(close, dtype=bool)
+    window_min = sliding_window_view(close, 2 * window + 1, axis=1).min(axis=2)
+    bottoms[:, window:width - window] = close[:, window:width - window] == window_min
+    bottoms &= columns[None, :] >= (valid_start + window)[:, None]
+    bottoms &= (lengths >= window * 3)[:, None]
+
+    # 2. 相邻两个低点组成一组候选
+    positions = np.where(bottoms, columns[None, :], width)
+    next_bottom = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+    next_bottom = np.concatenate([next_bottom[:, 1:], np.full((rows, 1), width)], axis=1)
+    row_idx, idx1 = np.nonzero(bottoms & (next_bottom < width))
+    idx2 = next_bottom[row_idx, idx1]
+
+    gap = idx2 - idx1
+    keep = (min_days <= gap) & (gap <= max_days)
+    price1, price2 = close[row_idx, idx1], close[row_idx, idx2]
+    keep &= ~(np.abs(price1 - price2) / price1 > price_diff)
+    keep &= ~(vol[row_idx, idx2] >= vol[row_idx, idx1])
+    row_idx, idx1, idx2, gap = row_idx[keep], idx1[keep], idx2[keep], gap[keep]
+
+    # 颈线：两个低点之间（不含第二个低点）的最高收盘价
+    neckline = close[row_idx, idx1]
+    for offset in range(1, max_days):
+        inside = offset < gap
+        neckline = np.where(inside, np.maximum(neckline, close[row_idx, np.minimum(idx1 + offset, width - 1)]),
+                            neckline)
+
+    # 3. 突破颈线且放量
+    candidate_close = close[row_idx]
+    breakout = (columns[None, :] > idx2[:, None]) & (candidate_close > neckline[:, None])
+    has_breakout = breakout.any(axis=1)
+    breakout_vol = vol[row_idx, breakout.argmax(axis=1)]
+
+    offsets = np.arange(-5, 0)[None, :]
+    avg_idx = idx2[:, None] + offsets
+    in_range = avg_idx >= valid_start[row_idx][:, None]
+    avg_values = np.where(in_range, vol[row_idx[:, None], np.clip(avg_idx, 0, width - 1)], np.nan)
+    avg_vol = _nanmean(avg_values)
+
+    hit = has_breakout & (breakout_vol > avg_vol * volume_ratio)
+    result = np.zeros(rows, dtype=bool)
+    result[row_idx[hit]] = True
+    return result
+
+
+def breakout_after_consolidation(panel, consolidation_days=30, recent_days=5, price_threshold=0.05,
+                                 volume_increase_threshold=1.2):
+    close, vol = panel.close, panel.vol
+    consolidation_close = close[:, -(consolidation_days + recent_days):-recent_days]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        max_price = np.nanmax(consolidation_close, axis=1)
+        min_price = np.nanmin(consolidation_close, axis=1)
+    price_range = (max_price - min_price) / min_price
+
+    recent_price_change = (close[:, -1] - close[:, -recent_days]) / close[:, -recent_days]
+    avg_volume_consolidation = _nanmean(vol[:, -(consolidation_days + recent_days):-recent_days])
+    avg_volume_recent = _nanmean(vol[:, -recent_days:])
+
+    result = (panel.lengths >= consolidation_days + recent_days)
+    result &= ~(price_range > price_threshold)
+    result &= ~(recent_price_change <= 0)
+    result &= ~(avg_volume_recent < avg_volume_consolidation * volume_increase_threshold)
+    return result
+
+
+def upward_trend(panel, macd=None):
+    close = panel.close
+    short_ma_last, short_ma_prev = _mean(close[:, -5:]), _mean(close[:, -6:-1])
+    long_ma_last, long_ma_prev = _mean(close[:, -60:]), _mean(close[:, -61:-1])
+    crossed = (short_ma_last > long_ma_last) & (short_ma_prev <= long_ma_prev)
+    return ((panel.lengths >= 20) & crossed & volume_surge_with_price_rise(panel, days=4)
+            & macd_golden_cross(panel, macd=macd))
+
+
+def funds_inflow_by_volume_turnover(panel, n=7, m=30, ratio=1.2, pct_positive=0.66):
+    vol, turnover = panel.vol, panel.turnover_rate
+    vol_recent = _nanmean(vol[:, -n:])
+    vol_ref = _nanmean(vol[:, -(n + m):-n])
+    turnover_recent = _nanmean(turnover[:, -n:])
+    turnover_ref = _nanmean(turnover[:, -(n + m):-n])
+    positive_days = (panel.pct_chg[:, -n:] > 0).sum(axis=1)
+    return ((panel.lengths >= n + m) & (vol_recent > vol_ref * ratio) & (turnover_recent > turnover_ref * ratio)
+            & (positive_days >= int(n * pct_positive)))
+
+
+def screen_panel(panel, excluded=None):
+    """
+    在整个面板上一次性计算所有状态
+
+    参数：
+        panel: Panel
+        excluded: 与panel.codes对应的布尔数组，为True的股票直接判定为不符合条件
+    返回：
+        DataFrame，行为股票代码，列为StockStatus，值为是否满足该状态
+    """
+    macd = _macd(panel)
+    matrix = {
+        StockStatus.THREE_LIMIT_UP: limit_up_3days(panel),
+        StockStatus.THREE_LIMIT_UP_ONLY: limit_up_only_3days(panel),
+        StockStatus.RISING_VOLUME_INCREASE: rising_with_volume_increase(panel, days=3),
+        StockStatus.VOLUME_SURGE_WITH_PRICE_RISE: volume_surge_with_price_rise(panel, days=3),
+        StockStatus.CAPITAL_INFLOW: capital_inflow(panel),
+        StockStatus.FUNDS_INFLOW_BY_VOLUME_TURNOVER: funds_inflow_by_volume_turnover(panel),
+        StockStatus.SUPPORT_LEVEL_REBOUND: stock_stabilizing(panel, days=3),
+        StockStatus.SUPPORT_LEVEL_REBOUND_60: stock_stabilizing_over60(panel),
+        StockStatus.MACD_GOLDEN_CROSS: macd_golden_cross(panel, macd=macd),
+        StockStatus.MACD_GOLDEN_CROSS_OVER_7: macd_golden_cross(panel, days=7, macd=macd),
+        StockStatus.DOUBLE_BOTTOM: double_bottom(panel),
+        StockStatus.DOUBLE_BOTTOM_NEW: double_bottom_new(panel),
+        StockStatus.BREAKOUT_AFTER_CONSOLIDATION: breakout_after_consolidation(panel),
+        StockStatus.IS_UPWARD_TREND: upward_trend(panel, macd=macd),
+    }
+
+    enough_data = panel.lengths >= MIN_DAILY_BARS
+    if excluded is not None:
+        enough_data &= ~np.asarray(excluded, dtype=bool)
+    for status in matrix:
+        matrix[status] = matrix[status] & enough_data
+    matrix[StockStatus.NO_MATCH] = ~np.any(list(matrix.values()), axis=0)
+
+    return pd.DataFrame({status: matrix[status] for status in StockStatus}, index=panel.codes)
+
+
+def to_status_lists(matrix):
+    """
+    将状态矩阵转为与 daily_check 相同格式的结果：{ts_code: [StockStatus, ...]}，
+    状态顺序与 tushare_check.DETECTORS 一致
+    """
+    order = [status for status, _, _ in DETECTORS]
+    results = {}
+    for ts_code, row in zip(matrix.index, matrix[order].to_numpy()):
+        statuses = [status for status, hit in zip(order, row) if hit]
+        results[ts_code] = statuses if statuses else [StockStatus.NO_MATCH]
+    return results
+
+
+def screen_stocks(stocks, frames):
+    """
+    对一批股票进行面板筛选
+
+    参数：
+        stocks: [(ts_code, name), ...]
+        frames: 与stocks一一对应的日线数据
+    返回：
+        {ts_code: [StockStatus, ...]}
+    """
+    codes = [ts_code for ts_code, _ in stocks]
+    excluded = [is_excluded(ts_code, name) for ts_code, name in stocks]
+    with metrics.timer('build_panel'):
+        panel = Panel.from_frames(codes, frames)
+    with metrics.timer('screen_panel'):
+        return to_status_lists(screen_panel(panel, excluded=excluded))
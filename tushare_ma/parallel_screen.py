@@ -0,0 +1,90 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from common.StockEnum import StockStatus
+from common.metrics import metrics
+from panel_screen import Panel, PANEL_FIELDS
+from detectors import evaluate_detectors, is_excluded, MIN_DAILY_BARS
+
+# 工作进程中挂载的共享内存和面板视图
+_worker_shm = None
+_worker_bars = None
+_worker_lengths = None
+
+
+def _init_worker(shm_name, shape, lengths):
+    """工作进程初始化：按名称挂载父进程创建的共享内存，不复制数据"""
+    global _worker_shm, _worker_bars, _worker_lengths
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_bars = np.ndarray(shape, dtype=np.float64, buffer=_worker_shm.buf)
+    _worker_lengths = lengths
+
+
+def _screen_shard(rows):
+    """
+    在工作进程中对一批股票（面板中的行号）执行 daily_check 的全部检测
+
+    返回：
+        (结果列表, 本批次的运行指标)
+    """
+    metrics.reset()
+    width = _worker_bars.shape[2]
+    results = []
+    for row in rows:
+        length = _worker_lengths[row]
+        # 从共享内存中取出该股票的有效数据，重建与 daily_check 相同的 DataFrame
+        daily_data = pd.DataFrame({name: _worker_bars[i, row, width - length:].copy()
+                                   for i, name in enumerate(PANEL_FIELDS)})
+        results.append(evaluate_detectors(daily_data))
+    return results, metrics.export_raw()
+
+
+def screen_parallel(stocks, frames, processes=None, shards_per_process=4):
+    """
+    多进程分片筛选：日线数据放入共享内存，各进程只接收股票行号，按原顺序汇总结果
+
+    参数：
+        stocks: [(ts_code, name), ...]
+        frames: 与stocks一一对应的日线数据（按trade_date升序），没有数据时为None
+        processes: 进程数，默认为CPU核数
+        shards_per_process: 每个进程分到的分片数，分片越多负载越均衡
+    返回：
+        {ts_code: [StockStatus, ...]}
+    """
+    processes = processes or os.cpu_count() or 1
+    codes = [ts_code for ts_code, _ in stocks]
+    panel = Panel.from_frames(codes, frames)
+
+    # 需要检测的股票：未被排除且数据足够
+    rows = [row for row, (ts_code, name) in enumerate(stocks)
+            if panel.lengths[row] >= MIN_DAILY_BARS and not is_excluded(ts_code, name)]
+    results = {ts_code: [StockStatus.NO_MATCH] for ts_code in codes}
+    if not rows:
+        return results
+
+    shape = (len(PANEL_FIELDS), len(codes), panel.width)
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8)
+    try:
+        bars = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        for i, name in enumerate(PANEL_FIELDS):
+            bars[i] = panel.fields[name]
+
+        shard_count = min(len(rows), processes * shards_per_process)
+        shards = [shard.tolist() for shard in np.array_split(rows, shard_count)]
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(shm.name, shape, panel.lengths)) as executor:
+            for shard, (shard_results, shard_metrics) in zip(shards, executor.map(_screen_shard, shards)):
+                # 子进程中的检测耗时合并到主进程
+                metrics.merge(shard_metrics)
+                for row, res in zip(shard, shard_results):
+                    results[codes[row]] = res
+        del bars
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return results
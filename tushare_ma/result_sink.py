@@ -0,0 +1,231 @@
+import argparse
+import os
+import sqlite3
+import sys
+import uuid
+from datetime import datetime
+
+# 添加项目根目录到sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.StockEnum import StockStatus
+
+# 每条结果附带的最新一根K线指标
+METRIC_FIELDS = ('close', 'pct_chg', 'vol', 'amount', 'turnover_rate')
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS screen_results (
+    run_id TEXT NOT NULL,
+    ts_code TEXT NOT NULL,
+    name TEXT,
+    status TEXT NOT NULL,
+    trade_date TEXT,
+    close REAL,
+    pct_chg REAL,
+    vol REAL,
+    amount REAL,
+    turnover_rate REAL
+)
+"""
+CREATE_RUNS_SQL = """
+CREATE TABLE IF NOT EXISTS screen_runs (
+    run_id TEXT PRIMARY KEY,
+    trade_date TEXT,
+    finished INTEGER NOT NULL DEFAULT 0
+)
+"""
+CREATE_PROGRESS_SQL = """
+CREATE TABLE IF NOT EXISTS screen_progress (
+    run_id TEXT NOT NULL,
+    ts_code TEXT NOT NULL,
+    PRIMARY KEY (run_id, ts_code)
+)
+"""
+CREATE_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_screen_results_run_status ON screen_results (run_id, status)",
+    "CREATE INDEX IF NOT EXISTS idx_screen_results_ts_code ON screen_results (ts_code)",
+)
+
+
+def _default_resource_dir():
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(project_root, 'resource')
+
+
+def last_bar_metrics(daily_data):
+    """取日线数据（按trade_date升序）最后一根K线的交易日和指标，没有数据时返回空值"""
+    metrics = {'trade_date': None}
+    metrics.update({field: None for field in METRIC_FIELDS})
+    if daily_data is None or len(daily_data) == 0:
+        return metrics
+
+    last = daily_data.iloc[-1]
+    if 'trade_date' in last:
+        metrics['trade_date'] = str(last['trade_date'])
+    for field in METRIC_FIELDS:
+        value = last.get(field)
+        if field == 'turnover_rate' and (value is None or value != value):
+            # pro_bar 返回的换手率字段为tor
+            value = last.get('tor')
+        metrics[field] = None if value is None or value != value else float(value)
+    return metrics
+
+
+class ResultSink:
+    """
+    筛选结果汇总：命中的结果先缓存在内存中，每处理 CHECKPOINT_EVERY 只股票批量写入一次SQLite结果表，
+    同时保存检查点（已处理的股票），中断后可以按同一交易日恢复运行，只处理剩余的股票。
+    各状态的txt文件由结果表按需导出。
+
+    结果表 screen_results 每行对应一只股票命中的一个状态：
+        run_id, ts_code, name, status(StockStatus的名称), trade_date, close, pct_chg, vol, amount, turnover_rate
+    运行记录表 screen_runs：run_id, trade_date(运行对应的交易日), finished
+    进度表 screen_progress：run_id, ts_code（已处理完成的股票，包括不符合条件的）
+    """
+
+    # 累计处理多少只股票后保存一次检查点
+    CHECKPOINT_EVERY = 200
+
+    def __init__(self, db_path=None, run_id=None):
+        if db_path is None:
+            db_path = os.path.join(_default_resource_dir(), 'screen_results.db')
+        self.db_path = db_path
+        # 精确到微秒并加上随机后缀，同一秒内启动的多次运行不会共用同一个run_id
+        self.run_id = run_id or f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{uuid.uuid4().hex[:6]}"
+        self._rows = []
+        self._done = []
+
+    def start(self, trade_date, resume=False):
+        """
+        登记本次运行
+
+        参数：
+            trade_date: 本次运行筛选的交易日
+            resume: 为True时接着该交易日最近一次未完成的运行继续，沿用其run_id
+        返回：
+            已经处理过的股票代码集合，新的运行返回空集合
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                if resume:
+                    row = conn.execute("SELECT run_id FROM screen_runs WHERE trade_date = ? AND finished = 0 "
+                                       "ORDER BY run_id DESC LIMIT 1", (trade_date,)).fetchone()
+                    if row:
+                        self.run_id = row[0]
+                        done = conn.execute("SELECT ts_code FROM screen_progress WHERE run_id = ?",
+                                            (self.run_id,)).fetchall()
+                        return {ts_code for ts_code, in done}
+                conn.execute("INSERT INTO screen_runs (run_id, trade_date, finished) VALUES (?, ?, 0)",
+                             (self.run_id, trade_date))
+        finally:
+            conn.close()
+        return set()
+
+    def add(self, ts_code, name, statuses, daily_data=None):
+        """缓存一只股票的检测结果并记为已处理，不符合条件的股票只记录进度"""
+        hits = [status for status in statuses if status != StockStatus.NO_MATCH]
+        if hits:
+            metrics = last_bar_metrics(daily_data)
+            for status in hits:
+                self._rows.append((self.run_id, ts_code, name, status.name, metrics['trade_date'])
+                                  + tuple(metrics[field] for field in METRIC_FIELDS))
+
+        self._done.append((self.run_id, ts_code))
+        if len(self._done) >= self.CHECKPOINT_EVERY:
+            self.flush()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(CREATE_TABLE_SQL)
+        conn.execute(CREATE_RUNS_SQL)
+        conn.execute(CREATE_PROGRESS_SQL)
+        for sql in CREATE_INDEX_SQL:
+            conn.execute(sql)
+        return conn
+
+    def flush(self):
+        """保存检查点：缓存的结果和处理进度在同一个事务中写入，中断时不会只写入一半"""
+        if not self._rows and not self._done:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT INTO screen_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._rows)
+                conn.executemany("INSERT OR IGNORE INTO screen_progress VALUES (?, ?)", self._done)
+        finally:
+            conn.close()
+        self._rows = []
+        self._done = []
+
+    def finish(self):
+        """写入剩余结果并将本次运行标记为完成，之后不会再被恢复"""
+        self.flush()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("UPDATE screen_runs SET finished = 1 WHERE run_id = ?", (self.run_id,))
+        finally:
+            conn.close()
+
+    def query(self, run_id=None, status=None):
+        """
+        查询结果表
+
+        参数：
+            run_id: 运行批次，默认为最近一次完成的运行
+            status: StockStatus，为None时返回全部状态
+        返回：
+            [(ts_code, name, status, trade_date, close, pct_chg, vol, amount, turnover_rate), ...]
+        """
+        if not os.path.exists(self.db_path):
+            return []
+        conn = self._connect()
+        try:
+            if run_id is None:
+                # 最近一次运行可能没有任何命中，按运行记录而不是结果表确定
+                row = conn.execute("SELECT run_id FROM screen_runs WHERE finished = 1 "
+                                   "ORDER BY run_id DESC LIMIT 1").fetchone()
+                run_id = row[0] if row else None
+            sql = ("SELECT ts_code, name, status, trade_date, " + ", ".join(METRIC_FIELDS)
+                   + " FROM screen_results WHERE run_id = ?")
+            params = [run_id]
+            if status is not None:
+                sql += " AND status = ?"
+                params.append(status.name)
+            return conn.execute(sql + " ORDER BY rowid", params).fetchall()
+        finally:
+            conn.close()
+
+    def export_status_files(self, out_dir=None, run_id=None):
+        """
+        按状态导出 <StockStatus.value>.txt，每行 "ts_code name"，与原来逐行写入的文件格式相同。
+        没有命中的状态不生成文件，并删除上一次运行留下的同名文件。
+        """
+        out_dir = out_dir or _default_resource_dir()
+        os.makedirs(out_dir, exist_ok=True)
+
+        by_status = {}
+        for ts_code, name, status, *_ in self.query(run_id=run_id):
+            by_status.setdefault(status, []).append(f"{ts_code} {name}\n")
+
+        for stock_status in StockStatus:
+            file_name = os.path.join(out_dir, f"{stock_status.value}.txt")
+            lines = by_status.get(stock_status.name)
+            if lines:
+                with open(file_name, 'w') as f:
+                    f.writelines(lines)
+            elif os.path.exists(file_name):
+                os.remove(file_name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='从结果表导出各状态的股票列表')
+    parser.add_argument('--run-id', default=None, help='运行批次，默认为最近一次完成的运行')
+    parser.add_argument('--out-dir', default=None, help='导出目录，默认为resource目录')
+    args = parser.parse_args()
+    ResultSink().export_status_files(out_dir=args.out_dir, run_id=args.run_id)
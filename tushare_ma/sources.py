@@ -0,0 +1,349 @@
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import baostock as bs
+import numpy as np
+import pandas as pd
+
+from common.data_source import data_source, encode_baostock_result, decode_baostock_result, read_baostock_rows
+from common.retry_policy import classify_error, DeadlineExceeded, RATE_LIMIT, PERMANENT
+from etf_monitor.eastmoney_crawler import EastMoneyAPI
+from float_share import FloatShareTable
+from tushare_check import load_daily_data
+
+# 各数据源统一输出的日线字段，单位与 tushare pro_bar 一致：
+#   trade_date YYYYMMDD，vol 手，amount 千元，pct_chg / turnover_rate 百分比
+DAILY_FIELDS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close', 'change', 'pct_chg', 'vol',
+                'amount', 'turnover_rate']
+
+
+def normalize_daily(df, ts_code):
+    """
+    转换为统一的日线格式：补齐缺失字段、统一日期格式和数值类型，按trade_date升序
+
+    参数：
+        df: 已经重命名为统一字段名的DataFrame
+        ts_code: 股票代码，tushare格式，例如 000001.SZ
+    """
+    if df is None or df.empty:
+        return None
+    df = df.copy()
+    df['ts_code'] = ts_code
+    df['trade_date'] = df['trade_date'].astype(str).str.replace('-', '', regex=False)
+    for col in DAILY_FIELDS[2:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce') if col in df.columns else np.nan
+
+    if df['pre_close'].isna().all():
+        df['pre_close'] = df['close'] / (1 + df['pct_chg'] / 100)
+    if df['change'].isna().all():
+        df['change'] = df['close'] - df['pre_close']
+    return df[DAILY_FIELDS].sort_values('trade_date').reset_index(drop=True)
+
+
+def to_baostock_code(ts_code):
+    """000001.SZ -> sz.000001"""
+    code, exchange = ts_code.split('.')
+    return f"{exchange.lower()}.{code}"
+
+
+def to_eastmoney_secid(ts_code):
+    """000001.SZ -> 0.000001，上海为1，深圳和北京为0"""
+    code, exchange = ts_code.split('.')
+    return f"{'1' if exchange.upper() == 'SH' else '0'}.{code}"
+
+
+def _baostock_api(api_name, func):
+    # baostock返回的结果需要逐行读取，录制时一次读出全部行
+    return data_source.wrap(f'baostock.{api_name}', func, encode=encode_baostock_result, decode=decode_baostock_result)
+
+
+def baostock_columns(fields, rows, numeric_fields=()):
+    """
+    将baostock返回的字符串行一次性转为按列的NumPy数组
+
+    参数：
+        numeric_fields: 需要转为float64的字段，空字符串转为NaN，其余字段保留为字符串
+    返回：
+        {字段: 数组}
+    """
+    table = np.array(rows, dtype=str).reshape(len(rows), len(fields))
+    columns = {}
+    for i, field in enumerate(fields):
+        column = table[:, i]
+        if field in numeric_fields:
+            column = np.where(column == '', 'nan', column).astype(np.float64)
+        columns[field] = column
+    return columns
+
+
+# baostock未登录（会话过期）或连接断开时返回的错误码，遇到后重新登录再查询一次
+BAOSTOCK_RELOGIN_CODES = ('10001001', '10002001', '10002002', '10002003', '10002004', '10002005', '10002006',
+                          '10002007', '10002008')
+
+
+class BaostockSession:
+    """
+    进程内共享的baostock会话：第一次查询时登录，之后的查询都复用这一次登录，
+    会话过期或连接断开时自动重新登录。baostock的所有查询共用一个全局连接，查询之间用锁串行。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._logged_in = False
+
+    def login(self):
+        with self._lock:
+            if self._logged_in:
+                return
+            lg = _baostock_api('login', bs.login)()
+            if lg.error_code != '0':
+                raise Exception(f"baostock登录失败[{lg.error_code}]：{lg.error_msg}")
+            self._logged_in = True
+
+    def reset(self):
+        """丢弃当前的登录状态，下一次查询时重新登录"""
+        with self._lock:
+            self._logged_in = False
+
+    def logout(self):
+        with self._lock:
+            if self._logged_in:
+                self._logged_in = False
+                _baostock_api('logout', bs.logout)()
+
+    def query(self, api_name, func, *args, **kwargs):
+        """
+        在已登录的会话中查询并读出全部行
+
+        返回：
+            (fields, rows)
+        """
+        with self._lock:
+            for attempt in range(2):
+                self.login()
+                rs = _baostock_api(api_name, func)(*args, **kwargs)
+                if rs.error_code in BAOSTOCK_RELOGIN_CODES and attempt == 0:
+                    print(f"baostock会话失效[{rs.error_code}]：{rs.error_msg}，重新登录")
+                    self._logged_in = False
+                    continue
+                if rs.error_code != '0':
+                    raise Exception(f"baostock查询失败[{rs.error_code}]：{rs.error_msg}")
+                return rs.fields, read_baostock_rows(rs)
+
+
+# 每个进程一个会话，进程退出时登出
+baostock_session = BaostockSession()
+atexit.register(baostock_session.logout)
+
+
+def _query_baostock(api_name, **kwargs):
+    return baostock_session.query(api_name, getattr(bs, api_name), **kwargs)
+
+
+# 换手率使用的流通股本表，定期刷新并缓存在本地，进程退出时落盘
+float_share_table = FloatShareTable(query=_query_baostock)
+atexit.register(float_share_table.flush)
+
+
+def _init_baostock_worker():
+    """进程池初始化：每个工作进程只登录一次。fork出的进程继承了父进程的连接，不能复用，重新登录"""
+    baostock_session.reset()
+    baostock_session.login()
+    float_share_table.auto_flush = False
+
+
+def _fetch_baostock_chunk(ts_codes, start_date, end_date):
+    """
+    返回：
+        ([(DataFrame或None, 错误信息或None), ...], 本批股票的流通股本表项)
+    """
+    source = BaostockSource()
+    results = []
+    for ts_code in ts_codes:
+        try:
+            results.append((source.fetch_daily(ts_code, start_date, end_date), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results, float_share_table.export(ts_codes)
+
+
+class TushareSource:
+    """tushare pro_bar，优先读取本地日线存储"""
+
+    name = 'tushare'
+
+    def fetch_daily(self, ts_code, start_date, end_date):
+        return load_daily_data(ts_code, start_date, end_date)
+
+
+class BaostockSource:
+    """
+    baostock 日线，换手率由本地缓存的 point-in-time 流通股本计算。
+    同一进程内的查询复用 baostock_session 的登录，批量获取时可以用进程池并行，每个进程各自登录一次。
+    """
+
+    name = 'baostock'
+
+    # 进程池每个任务处理的股票数
+    CHUNK_SIZE = 50
+    # 日线结果中需要转为数值的字段
+    NUMERIC_FIELDS = ('open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'pctChg')
+
+    def __init__(self, processes=None):
+        """
+        参数：
+            processes: fetch_many 使用的进程数，None或1时在当前进程中逐只获取
+        """
+        self.processes = processes
+
+    def fetch_daily(self, ts_code, start_date, end_date):
+        code = to_baostock_code(ts_code)
+        fields, rows = baostock_session.query(
+            'query_history_k_data_plus', bs.query_history_k_data_plus,
+            code,
+            "date,code,open,high,low,close,preclose,volume,amount,pctChg",
+            start_date=f"{start_date[:4]}-{start_date[4:6]}-{start_date[6:]}",
+            end_date=f"{end_date[:4]}-{end_date[4:6]}-{end_date[6:]}",
+            frequency="d",
+            adjustflag="3"
+        )
+        if not rows:
+            return None
+        columns = baostock_columns(fields, rows, numeric_fields=self.NUMERIC_FIELDS)
+        trade_dates = np.char.replace(columns['date'], '-', '')
+        volume = columns['volume']
+
+        # 按每个交易日当时的流通股本计算换手率
+        float_share_table.ensure(ts_code, code, end_date)
+        daily_data = pd.DataFrame({
+            'trade_date': trade_dates,
+            'open': columns['open'],
+            'high': columns['high'],
+            'low': columns['low'],
+            'close': columns['close'],
+            'pre_close': columns['preclose'],
+            'pct_chg': columns['pctChg'],
+            # baostock成交量单位为股、成交额单位为元，转为tushare的手和千元
+            'vol': volume / 100,
+            'amount': columns['amount'] / 1000,
+            'turnover_rate': volume / float_share_table.lookup(ts_code, trade_dates) * 100,
+        })
+        return normalize_daily(daily_data, ts_code)
+
+    def fetch_many(self, ts_codes, start_date, end_date):
+        """
+        批量获取多只股票的日线
+
+        返回：
+            与ts_codes一一对应的 [(DataFrame或None, 错误信息或None), ...]
+        """
+        if not self.processes or self.processes <= 1:
+            results, _ = _fetch_baostock_chunk(ts_codes, start_date, end_date)
+            float_share_table.flush()
+            return results
+
+        chunks = [ts_codes[i:i + self.CHUNK_SIZE] for i in range(0, len(ts_codes), self.CHUNK_SIZE)]
+        results = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_baostock_worker) as executor:
+                futures = [executor.submit(_fetch_baostock_chunk, chunk, start_date, end_date) for chunk in chunks]
+                for future in futures:
+                    chunk_results, float_shares = future.result()
+                    results.extend(chunk_results)
+                    # 工作进程刷新的流通股本合并回主进程
+                    float_share_table.update(float_shares)
+        finally:
+            float_share_table.flush()
+        return results
+
+
+class EastMoneySource:
+    """东方财富日线，接口不返回涨跌幅，由相邻收盘价在本地计算"""
+
+    name = 'eastmoney'
+
+    # 多取几天数据，保证第一天也能计算涨跌幅
+    LOOKBACK_PAD_DAYS = 15
+
+    def __init__(self, api=None):
+        self.api = api or EastMoneyAPI()
+
+    def fetch_daily(self, ts_code, start_date, end_date):
+        padded_start = (datetime.strptime(start_date, '%Y%m%d') - timedelta(days=self.LOOKBACK_PAD_DAYS)).strftime(
+            '%Y%m%d')
+        df = self.api.get_daily_data(to_eastmoney_secid(ts_code), padded_start, end_date)
+        if df is None or df.empty:
+            return None
+        df = df.copy()
+        df['pre_close'] = df['close'].shift(1)
+        df['pct_chg'] = (df['close'] / df['pre_close'] - 1) * 100
+        # 东方财富成交额单位为元
+        df['amount'] = df['amount'] / 1000
+        df = normalize_daily(df, ts_code)
+        return df[(df['trade_date'] >= start_date) & df['pct_chg'].notna()].reset_index(drop=True)
+
+
+class SourceRouter:
+    """
+    按顺序尝试多个数据源：当前数据源出错或没有数据时换下一个。
+    触发频率限制或额度、权限等永久错误的数据源在本次运行中不再使用，运行时间预算用完时直接停止。
+    """
+
+    name = 'auto'
+
+    def __init__(self, sources):
+        self.sources = list(sources)
+        self._disabled = set()
+        self._lock = threading.Lock()
+
+    def available(self):
+        with self._lock:
+            return [source for source in self.sources if source.name not in self._disabled]
+
+    def fetch_daily(self, ts_code, start_date, end_date):
+        last_error = None
+        for source in self.available():
+            try:
+                daily_data = source.fetch_daily(ts_code, start_date, end_date)
+            except DeadlineExceeded:
+                # 运行时间预算用完时停止整个运行，不换数据源继续
+                raise
+            except Exception as e:
+                last_error = e
+                # 只有重试后仍然限流，或权限、额度等整个数据源都不可用的错误才停用该数据源，
+                # 单只股票的错误（包括错误信息中带有股票代码的）只换下一个数据源
+                if classify_error(e) in (RATE_LIMIT, PERMANENT):
+                    with self._lock:
+                        self._disabled.add(source.name)
+                    print(f"数据源{source.name}不可用，本次运行不再使用：{e}")
+                else:
+                    print(f"[{ts_code}] 数据源{source.name}获取失败，尝试下一个：{e}")
+                continue
+            if daily_data is not None and not daily_data.empty:
+                return daily_data
+        if last_error is not None:
+            raise last_error
+        return None
+
+
+SOURCES = {
+    'tushare': TushareSource,
+    'baostock': BaostockSource,
+    'eastmoney': EastMoneySource,
+}
+
+
+def get_source(name, processes=None):
+    """
+    按名称获取数据源：tushare / baostock / eastmoney，auto 按 tushare、baostock、东方财富的顺序自动切换
+
+    参数：
+        processes: baostock批量获取时使用的进程数
+    """
+    if name == 'auto':
+        return SourceRouter([TushareSource(), BaostockSource(), EastMoneySource()])
+    if name == 'baostock':
+        return BaostockSource(processes=processes)
+    return SOURCES[name]()
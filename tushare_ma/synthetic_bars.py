@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# 生成数据时可以注入的形态
+PATTERNS = ('random', 'limit_up', 'double_bottom', 'consolidation')
+
+# 最后一个交易日固定，保证相同参数生成的数据完全一致
+DEFAULT_END_DATE = '20240628'
+
+
+def _random_walk(rng, days):
+    pct_chg = rng.normal(0.05, 2.0, days)
+    vol = rng.uniform(5e4, 2e5) * np.exp(np.cumsum(rng.normal(0, 0.08, days)))
+    return pct_chg, vol
+
+
+def _inject_limit_up(rng, pct_chg, vol):
+    """最近若干天连续涨停，成交量同步放大"""
+    streak = int(rng.integers(1, 5))
+    pct_chg[-streak:] = rng.uniform(9.95, 10.02, streak)
+    vol[-streak:] *= rng.uniform(1.5, 3.0)
+
+
+def _inject_double_bottom(rng, pct_chg, vol):
+    """最近一段时间先跌、反弹、再跌到相近低点后回升，第二个底部放量"""
+    days = len(pct_chg)
+    span = min(days, int(rng.integers(30, 60)))
+    legs = np.array_split(np.arange(days - span, days), 4)
+    for leg, drift in zip(legs, (-1.2, 1.0, -1.0, 1.2)):
+        pct_chg[leg] = rng.normal(drift, 0.5, len(leg))
+    vol[legs[3]] *= rng.uniform(1.3, 2.0)
+
+
+def _inject_consolidation(rng, pct_chg, vol):
+    """较长时间窄幅横盘，最近几天放量突破"""
+    days = len(pct_chg)
+    span = min(days, int(rng.integers(35, 50)))
+    breakout = int(rng.integers(2, 5))
+    pct_chg[days - span:days - breakout] = rng.normal(0, 0.4, span - breakout)
+    pct_chg[days - breakout:] = rng.uniform(2.5, 6.0, breakout)
+    vol[days - breakout:] *= rng.uniform(2.0, 4.0)
+
+
+_INJECTORS = {
+    'limit_up': _inject_limit_up,
+    'double_bottom': _inject_double_bottom,
+    'consolidation': _inject_consolidation,
+}
+
+
+def generate_bars(ts_code, days=90, pattern='random', seed=0, end_date=DEFAULT_END_DATE):
+    """
+    生成一只股票的合成日线数据，字段与 ts.pro_bar(factors=['tor', 'vr']) 的日线数据一致，按trade_date升序
+
+    参数：
+        ts_code: 股票代码
+        days: 交易日数量
+        pattern: 注入的形态，见 PATTERNS
+        seed: 随机种子，相同参数生成的数据相同
+        end_date: 最后一个交易日
+    """
+    rng = np.random.default_rng(seed)
+    pct_chg, vol = _random_walk(rng, days)
+    if pattern in _INJECTORS:
+        _INJECTORS[pattern](rng, pct_chg, vol)
+
+    close = np.round(rng.uniform(5, 50) * np.cumprod(1 + pct_chg / 100), 2)
+    pre_close = np.concatenate(([close[0] / (1 + pct_chg[0] / 100)], close[:-1]))
+    # 收盘价四舍五入后重新计算涨跌幅，保持字段之间一致
+    pct_chg = np.round((close / pre_close - 1) * 100, 4)
+    spread = np.abs(rng.normal(0, 0.01, days))
+    open_ = np.round(pre_close * (1 + rng.normal(0, 0.005, days)), 2)
+    high = np.round(np.maximum(open_, close) * (1 + spread), 2)
+    low = np.round(np.minimum(open_, close) * (1 - spread), 2)
+    vol = np.round(vol, 2)
+    float_share = rng.uniform(1e6, 1e7)
+
+    trade_dates = pd.bdate_range(end=pd.Timestamp(end_date), periods=days).strftime('%Y%m%d')
+    return pd.DataFrame({
+        'ts_code': ts_code,
+        'trade_date': trade_dates,
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'pre_close': pre_close,
+        'change': close - pre_close,
+        'pct_chg': pct_chg,
+        'vol': vol,
+        'amount': vol * close / 10,
+        'turnover_rate': vol / float_share * 100,
+        'volume_ratio': vol / pd.Series(vol).rolling(5, min_periods=1).mean().shift(1).fillna(vol[0]).to_numpy(),
+    })
+
+
+def generate_universe(stocks=500, days=90, seed=0, pattern_weights=None, end_date=DEFAULT_END_DATE):
+    """
+    生成一批股票的合成日线数据
+
+    参数：
+        stocks: 股票数量
+        days: 每只股票的交易日数量
+        seed: 随机种子
+        pattern_weights: {形态: 权重}，默认大部分为随机走势，少量注入涨停、双底和横盘突破
+    返回：
+        ([(ts_code, name), ...], [DataFrame, ...])
+    """
+    pattern_weights = pattern_weights or {'random': 0.7, 'limit_up': 0.1, 'double_bottom': 0.1, 'consolidation': 0.1}
+    names = list(pattern_weights)
+    weights = np.array([pattern_weights[name] for name in names], dtype=float)
+    rng = np.random.default_rng(seed)
+    patterns = rng.choice(names, size=stocks, p=weights / weights.sum())
+
+    universe, frames = [], []
+    for i, pattern in enumerate(patterns):
+        ts_code = f"{i + 1:06d}.SZ"
+        universe.append((ts_code, f"合成{pattern}{i}"))
+        frames.append(generate_bars(ts_code, days=days, pattern=pattern, seed=seed * 1000003 + i, end_date=end_date))
+    return universe, frames
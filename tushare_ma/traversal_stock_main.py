@@ -1,129 +1,301 @@
-import time
-import pandas as pd
+import argparse
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from common import StockEnum
-from tushare_check import daily_check
+from common.metrics import metrics, print_report
+from common.retry_policy import DeadlineExceeded
+from detectors import is_excluded, MIN_DAILY_BARS
+from tushare_check import check_stock, bar_store, detector_memo, default_date_range, confirmed_end_date, run_budget, \
+    load_daily_data
+from market_ingest import ingest_market
+from panel_screen import screen_stocks
+from parallel_screen import screen_parallel
+from result_sink import ResultSink
+from sources import SOURCES, get_source
+from universe import load_universe, plan_universe
 
+# 命中各状态时在控制台输出的信息
+STATUS_MESSAGES = {
+    StockEnum.StockStatus.THREE_LIMIT_UP: "连续3天涨停",
+    StockEnum.StockStatus.THREE_LIMIT_UP_ONLY: "最近3天涨停",
+    StockEnum.StockStatus.RISING_VOLUME_INCREASE: "连续5天上涨且成交量增加",
+    StockEnum.StockStatus.VOLUME_SURGE_WITH_PRICE_RISE: "出现大幅放量伴随上涨",
+    StockEnum.StockStatus.CAPITAL_INFLOW: "出现资金流入明显",
+    StockEnum.StockStatus.SUPPORT_LEVEL_REBOUND: "出现底部支撑反弹",
+    StockEnum.StockStatus.SUPPORT_LEVEL_REBOUND_60: "出现底部支撑反弹60日均线",
+    StockEnum.StockStatus.MACD_GOLDEN_CROSS: "出现MACD金叉",
+    StockEnum.StockStatus.DOUBLE_BOTTOM: "出现双底结构",
+    StockEnum.StockStatus.DOUBLE_BOTTOM_NEW: "出现双底结构(新)",
+    StockEnum.StockStatus.BREAKOUT_AFTER_CONSOLIDATION: "横盘后放量上涨",
+    StockEnum.StockStatus.IS_UPWARD_TREND: "处于上涨初期",
+    StockEnum.StockStatus.MACD_GOLDEN_CROSS_OVER_7: "最近7天MACD金叉",
+    StockEnum.StockStatus.FUNDS_INFLOW_BY_VOLUME_TURNOVER: "成交量换手率放大",
+}
+
+
+def traversal(ingest_mode='stock', workers=8, run_deadline=None, engine='daily', processes=None, resume=False,
+              source='tushare', min_listed_bars=MIN_DAILY_BARS, memo=True):
+    """
+    遍历全部股票并按状态输出结果
+
+    参数：
+        ingest_mode: 日线数据获取方式
+            - stock: 每只股票单独获取缺失的日线
+            - market: 先按交易日获取全市场日线写入本地存储，遍历时只读本地数据
+        workers: 并发检查的线程数，接口调用频率由 tushare_check 中的令牌桶统一限制
+        run_deadline: 整个运行的时间预算（秒），用完后停止发起新的请求，None表示不限制
+        engine: 筛选引擎
+            - daily: 逐只股票调用 daily_check
+            - panel: 将全市场数据组成面板，用数组运算一次性筛选
+            - parallel: 日线数据放入共享内存，按股票分片交给多个进程执行 daily_check 的检测
+        processes: parallel 引擎使用的进程数，默认为CPU核数；数据源为baostock时也是并行获取日线的进程数
+        resume: 接着同一交易日上一次中断的运行继续，跳过已经处理过的股票
+        source: 日线数据源 tushare / baostock / eastmoney，auto 在数据源出错或额度用完时自动切换
+        min_listed_bars: 上市不足该交易日数的股票不获取数据，默认与检测引擎的最少日线数相同
+        memo: 是否使用检测结果缓存，False时全部重新检测
+    """
+    run_budget.start(run_deadline)
+    detector_memo.enabled = memo
+    metrics.reset()
 
-def traversal():
     # 获取项目根目录
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     # 确保resource目录存在
     resource_dir = os.path.join(project_root, 'resource')
     if not os.path.exists(resource_dir):
         os.makedirs(resource_dir)
-        
-    file_dict = {}
-    for stock_status in StockEnum.StockStatus:
-        file_name = os.path.join(resource_dir, f"{stock_status.value}.txt")
-        f = open(file_name, 'w')
-        file_dict[stock_status] = f
-
-    # 读取存储的股票数据
-    stock_data_path = os.path.join(project_root, 'resource', 'stock_data.json')
-    stock_data = pd.read_json(stock_data_path)
-
-    for index, row in stock_data.iterrows():
-        if not isinstance(index, int):
-            print("不是int类型")
-            break
-        if isinstance(index, int) and index < 0:
-            continue
-
-        ts_code = row['ts_code']
-        name = row['name']
+
+    # 命中结果先缓存在内存中，定期保存检查点，运行结束后写入剩余结果
+    sink = ResultSink(os.path.join(resource_dir, 'screen_results.db'))
+    trade_date = confirmed_end_date(default_date_range()[1])
+    done = sink.start(trade_date, resume=resume)
+    if done:
+        print(f"恢复运行{sink.run_id}，跳过已处理的{len(done)}只股票")
+
+    # 读取股票池，在获取数据之前排除不可能命中的股票
+    universe = load_universe(os.path.join(resource_dir, 'stock_data.json'), os.path.join(resource_dir, 'universe.parquet'))
+    stocks, skipped = plan_universe(universe, trade_date, min_bars=min_listed_bars, skip=done)
+    print(f"股票池共{len(universe)}只，需要检查{len(stocks)}只，排除{skipped['excluded']}只，"
+          f"上市不足{min_listed_bars}个交易日{skipped['too_new']}只，已处理{skipped['done']}只")
+
+    # tushare使用默认的本地日线存储
+    daily_source = None if source == 'tushare' else get_source(source, processes=processes)
+
+    if ingest_mode == 'market':
+        start_date, end_date = default_date_range()
+        ingest_market(start_date, end_date, ts_codes=universe.index.tolist())
+
+    if engine == 'panel':
+        results = iter_panel_check(stocks, workers, daily_source)
+    elif engine == 'parallel':
+        results = iter_parallel_check(stocks, workers, processes, daily_source)
+    else:
+        results = iter_daily_check(stocks, workers, daily_source)
+
+    processed = 0
+    # 已经尝试过的股票，包括获取数据或检查失败的股票，用于判断本次运行是否遍历完成
+    attempted = 0
+    failed = 0
+    try:
+        for ts_code, name, res, daily_data in results:
+            attempted += 1
+            if res is None:
+                failed += 1
+                continue
+            if StockEnum.StockStatus.NO_MATCH in res:
+                print(f"[{ts_code}][{name}]不符合要求")
+            for stock_status, message in STATUS_MESSAGES.items():
+                if stock_status in res:
+                    print(f"[{ts_code}][{name}] {message}")
+                    metrics.incr(f'hit.{stock_status.name}')
+            with metrics.timer('write'):
+                sink.add(ts_code, name, res, daily_data)
+            processed += 1
+    finally:
+        # 中断时也保存本地日线存储的索引和已经处理的进度，可以用 --resume 继续
+        with metrics.timer('write'):
+            bar_store.flush()
+            detector_memo.flush()
+            sink.flush()
+
+    # 全部股票都尝试过才算完成，个别股票获取数据或检查失败不影响完成
+    if attempted == len(stocks):
+        sink.finish()
+        if failed:
+            print(f"有{failed}只股票检查失败，未计入结果")
+        # 导出各状态的股票列表（没有命中的状态不生成文件），未完成的运行不覆盖上一次完整运行的文件
+        with metrics.timer('write'):
+            sink.export_status_files(resource_dir, run_id=sink.run_id)
+    else:
+        print(f"有股票未处理完成，可以使用 --resume 继续运行{sink.run_id}")
+
+    # 输出本次运行的指标报告，并保存为 resource/metrics/<run_id>.json
+    elapsed = metrics.elapsed()
+    report = metrics.save(os.path.join(resource_dir, 'metrics', f"{sink.run_id}.json"), extra={
+        'run_id': sink.run_id,
+        'engine': engine,
+        'stocks_processed': processed,
+        'stocks_skipped': skipped,
+        'stocks_per_second': processed / elapsed if elapsed > 0 else 0.0,
+        'hit_rates': {stock_status.name: metrics.count(f'hit.{stock_status.name}') / processed
+                      for stock_status in STATUS_MESSAGES if processed},
+    })
+    print_report(report)
+
+
+def iter_daily_check(stocks, workers, source=None):
+    """
+    并发调用 daily_check，按原顺序逐个返回 (ts_code, name, 结果, 日线数据)
+    单只股票检查失败时返回 (ts_code, name, None, None)，运行时间预算用完时停止
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(check_stock, ts_code, name, source) for ts_code, name in stocks]
+
+    try:
+        for (ts_code, name), future in zip(stocks, futures):
+            print("[%s][%s]" % (ts_code, name))
+
+            try:
+                res, daily_data = future.result()
+            except DeadlineExceeded as e:
+                print(f"[{ts_code}][{name}] {e}，停止遍历")
+                break
+            except Exception as e:
+                # 单只股票重试失败不影响整体遍历
+                print(f"[{ts_code}][{name}] 检查失败：{e}")
+                yield ts_code, name, None, None
+                continue
+
+            yield ts_code, name, res, daily_data
+    finally:
+        # 出现异常时取消尚未开始的任务
+        executor.shutdown(cancel_futures=True)
+
+
+def load_frames(stocks, workers, source=None):
+    """
+    并发准备所有股票的日线数据
+
+    返回：
+        (日线数据列表, 获取失败的股票代码集合)，被排除或获取失败的股票日线数据为None
+    """
+    start_date, end_date = default_date_range()
+    failed = set()
+
+    def load(stock):
+        ts_code, name = stock
+        if is_excluded(ts_code, name):
+            return None
+        try:
+            with metrics.timer('load'):
+                if source is None:
+                    return load_daily_data(ts_code, start_date, end_date)
+                return source.fetch_daily(ts_code, start_date, end_date)
+        except Exception as e:
+            print(f"[{ts_code}][{name}] 获取数据失败：{e}")
+            failed.add(ts_code)
+            return None
+
+    if hasattr(source, 'fetch_many'):
+        # 数据源支持批量获取时（例如baostock进程池），一次提交全部股票
+        rows = [row for row, (ts_code, name) in enumerate(stocks) if not is_excluded(ts_code, name)]
+        frames = [None] * len(stocks)
+        with metrics.timer('load_frames'):
+            fetched = source.fetch_many([stocks[row][0] for row in rows], start_date, end_date)
+        for row, (daily_data, error) in zip(rows, fetched):
+            if error is not None:
+                print(f"[{stocks[row][0]}][{stocks[row][1]}] 获取数据失败：{error}")
+                failed.add(stocks[row][0])
+            frames[row] = daily_data
+        return frames, failed
+
+    with metrics.timer('load_frames'), ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(load, stocks)), failed
+
+
+def screen_with_memo(stocks, frames, source, screen, engine):
+    """
+    命中检测结果缓存的股票直接使用缓存的结果，其余股票交给 screen(stocks, frames) 批量筛选
+
+    参数：
+        engine: 筛选引擎名称，各引擎的结果分开缓存
+
+    返回：
+        {ts_code: [StockStatus, ...]}
+    """
+    source_name = source.name if source is not None else 'tushare'
+    results = {}
+    misses = []
+    for row, ((ts_code, name), daily_data) in enumerate(zip(stocks, frames)):
+        cached = detector_memo.get(ts_code, source_name, daily_data, engine)
+        if cached is None:
+            misses.append(row)
+        else:
+            results[ts_code] = cached
+
+    if misses:
+        screened = screen([stocks[row] for row in misses], [frames[row] for row in misses])
+        for row in misses:
+            ts_code = stocks[row][0]
+            results[ts_code] = screened[ts_code]
+            detector_memo.put(ts_code, source_name, frames[row], screened[ts_code], engine)
+    return results
+
+
+def iter_panel_check(stocks, workers, source=None):
+    """
+    先并发准备好所有股票的日线数据，再用面板引擎一次性筛选全市场，按原顺序逐个返回 (ts_code, name, 结果, 日线数据)
+    获取数据失败的股票返回 (ts_code, name, None, None)
+    """
+    frames, failed = load_frames(stocks, workers, source)
+    results = screen_with_memo(stocks, frames, source, screen_stocks, 'panel')
+    for (ts_code, name), daily_data in zip(stocks, frames):
         print("[%s][%s]" % (ts_code, name))
+        if ts_code in failed:
+            yield ts_code, name, None, None
+        else:
+            yield ts_code, name, results[ts_code], daily_data
+
 
-        # 调用 daily_check 函数获取结果
-        res = daily_check(ts_code, name)
-
-        if StockEnum.StockStatus.NO_MATCH in res:
-            print(f"[{ts_code}][{name}]不符合要求")
-        if StockEnum.StockStatus.THREE_LIMIT_UP in res:
-            print(f"[{ts_code}][{name}] 连续3天涨停")
-            file_dict[StockEnum.StockStatus.THREE_LIMIT_UP].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.THREE_LIMIT_UP].flush()
-        if StockEnum.StockStatus.THREE_LIMIT_UP_ONLY in res:
-            print(f"[{ts_code}][{name}] 最近3天涨停")
-            file_dict[StockEnum.StockStatus.THREE_LIMIT_UP_ONLY].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.THREE_LIMIT_UP_ONLY].flush()
-        if StockEnum.StockStatus.RISING_VOLUME_INCREASE in res:
-            print(f"[{ts_code}][{name}] 连续5天上涨且成交量增加")
-            file_dict[StockEnum.StockStatus.RISING_VOLUME_INCREASE].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.RISING_VOLUME_INCREASE].flush()
-        if StockEnum.StockStatus.VOLUME_SURGE_WITH_PRICE_RISE in res:
-            print(f"[{ts_code}][{name}] 出现大幅放量伴随上涨")
-            file_dict[StockEnum.StockStatus.VOLUME_SURGE_WITH_PRICE_RISE].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.VOLUME_SURGE_WITH_PRICE_RISE].flush()
-        if StockEnum.StockStatus.CAPITAL_INFLOW in res:
-            print(f"[{ts_code}][{name}] 出现资金流入明显")
-            file_dict[StockEnum.StockStatus.CAPITAL_INFLOW].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.CAPITAL_INFLOW].flush()
-        if StockEnum.StockStatus.SUPPORT_LEVEL_REBOUND in res:
-            print(f"[{ts_code}][{name}] 出现底部支撑反弹")
-            file_dict[StockEnum.StockStatus.SUPPORT_LEVEL_REBOUND].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.SUPPORT_LEVEL_REBOUND].flush()
-        if StockEnum.StockStatus.MACD_GOLDEN_CROSS in res:
-            print(f"[{ts_code}][{name}] 出现MACD金叉")
-            file_dict[StockEnum.StockStatus.MACD_GOLDEN_CROSS].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.MACD_GOLDEN_CROSS].flush()
-        if StockEnum.StockStatus.DOUBLE_BOTTOM in res:
-            print(f"[{ts_code}][{name}] 出现双底结构")
-            file_dict[StockEnum.StockStatus.DOUBLE_BOTTOM].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.DOUBLE_BOTTOM].flush()
-        if StockEnum.StockStatus.DOUBLE_BOTTOM_NEW in res:
-            print(f"[{ts_code}][{name}] 出现双底结构(新)")
-            file_dict[StockEnum.StockStatus.DOUBLE_BOTTOM_NEW].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.DOUBLE_BOTTOM_NEW].flush()
-        if StockEnum.StockStatus.BREAKOUT_AFTER_CONSOLIDATION in res:
-            print(f"[{ts_code}][{name}] 横盘后放量上涨")
-            file_dict[StockEnum.StockStatus.BREAKOUT_AFTER_CONSOLIDATION].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.BREAKOUT_AFTER_CONSOLIDATION].flush()
-        if StockEnum.StockStatus.IS_UPWARD_TREND in res:
-            print(f"[{ts_code}][{name}] 处于上涨初期")
-            file_dict[StockEnum.StockStatus.IS_UPWARD_TREND].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.IS_UPWARD_TREND].flush()
-        if StockEnum.StockStatus.MACD_GOLDEN_CROSS_OVER_7 in res:
-            print(f"[{ts_code}][{name}] 最近7天MACD金叉")
-            file_dict[StockEnum.StockStatus.MACD_GOLDEN_CROSS_OVER_7].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.MACD_GOLDEN_CROSS_OVER_7].flush()
-        if StockEnum.StockStatus.FUNDS_INFLOW_BY_VOLUME_TURNOVER in res:
-            print(f"[{ts_code}][{name}] 成交量换手率放大")
-            file_dict[StockEnum.StockStatus.FUNDS_INFLOW_BY_VOLUME_TURNOVER].write(f"{ts_code} {name}\n")
-            file_dict[StockEnum.StockStatus.FUNDS_INFLOW_BY_VOLUME_TURNOVER].flush()
-
-        # 延迟3秒
-        time.sleep(1)
-
-    # 现在关闭字典中所有的文件对象
-    for file_obj in file_dict.values():
-        file_obj.close()
-
-    for stock_status in StockEnum.StockStatus:
-        file_name = os.path.join(project_root, 'resource', f"{stock_status.value}.txt")
-        remove_empty_file(file_name)
-
-
-def remove_empty_file(file_path):
-    # 检查文件是否存在
-    if os.path.exists(file_path):
-        # 打开文件，检查内容是否为空
-        with open(file_path, 'r') as file:
-            content = file.read().strip()  # 去除空白字符
-        # 如果内容为空，则删除文件
-        if not content:
-            os.remove(file_path)
-            print(f"已删除空文件: {file_path}")
+def iter_parallel_check(stocks, workers, processes=None, source=None):
+    """
+    先并发准备好所有股票的日线数据，再按股票分片交给多个进程检测，按原顺序逐个返回 (ts_code, name, 结果, 日线数据)
+    获取数据失败的股票返回 (ts_code, name, None, None)
+    """
+    frames, failed = load_frames(stocks, workers, source)
+    results = screen_with_memo(stocks, frames, source,
+                               lambda miss_stocks, miss_frames: screen_parallel(miss_stocks, miss_frames, processes),
+                               'parallel')
+    for (ts_code, name), daily_data in zip(stocks, frames):
+        print("[%s][%s]" % (ts_code, name))
+        if ts_code in failed:
+            yield ts_code, name, None, None
         else:
-            print(f"文件不是空的: {file_path}")
-    else:
-        print(f"文件不存在: {file_path}")
+            yield ts_code, name, results[ts_code], daily_data
 
 
 if __name__ == '__main__':
-    traversal()
+    parser = argparse.ArgumentParser(description='遍历全部股票进行形态筛选')
+    parser.add_argument('--ingest-mode', choices=['stock', 'market'], default='stock',
+                        help='stock: 按股票获取日线; market: 按交易日获取全市场日线')
+    parser.add_argument('--workers', type=int, default=8, help='并发检查的线程数')
+    parser.add_argument('--run-deadline', type=float, default=None, help='整个运行的时间预算（分钟）')
+    parser.add_argument('--engine', choices=['daily', 'panel', 'parallel'], default='daily',
+                        help='daily: 逐只股票检查; panel: 全市场面板一次性筛选; parallel: 多进程分片检查')
+    parser.add_argument('--source', choices=list(SOURCES) + ['auto'], default='tushare',
+                        help='日线数据源，auto: 出错或额度用完时自动切换')
+    parser.add_argument('--resume', action='store_true', help='接着同一交易日上一次中断的运行继续')
+    parser.add_argument('--processes', type=int, default=None, help='parallel 引擎的进程数，默认为CPU核数')
+    parser.add_argument('--no-memo', action='store_true', help='不使用检测结果缓存，全部重新检测')
+    parser.add_argument('--min-listed-bars', type=int, default=MIN_DAILY_BARS,
+                        help='上市不足该交易日数的股票不获取数据，例如60只检查上市满60个交易日的股票')
+    args = parser.parse_args()
+    run_deadline = args.run_deadline * 60 if args.run_deadline is not None else None
+    traversal(ingest_mode=args.ingest_mode, workers=args.workers, run_deadline=run_deadline, engine=args.engine,
+              processes=args.processes, resume=args.resume, source=args.source, min_listed_bars=args.min_listed_bars,
+              memo=not args.no_memo)
@@ -1,21 +1,34 @@
-import tushare as ts
-from common.tushare_token import tushare_token
+import os
+import sys
 
+# 添加项目根目录到sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.data_source import data_source
+from tushare_check import pro, call_with_retry
+from universe import build_universe, refresh_universe, LISTED, DELISTED, RENAMED
 
-def all_stock():
-    # 初始化pro接口
-    pro = ts.pro_api(tushare_token)
 
+def all_stock():
+    """
+    拉取全部股票列表，与已保存的股票池比较后增量更新：
+    新上市、退市、改名（例如名称加上ST）记入 resource/universe_changes.jsonl，股票池快照保存为 resource/universe.parquet
+    """
     # 拉取数据
-    df = pro.stock_basic(
-        **{"ts_code": "", "name": "", "exchange": "", "market": "", "is_hs": "", "list_status": "", "limit": "",
-           "offset": ""},
-        fields=["ts_code", "symbol", "name", "market", "list_date"])
+    df = call_with_retry(data_source.wrap('tushare.stock_basic', pro.stock_basic),
+                         **{"ts_code": "", "name": "", "exchange": "", "market": "", "is_hs": "", "list_status": "",
+                            "limit": "", "offset": ""},
+                         fields=["ts_code", "symbol", "name", "market", "list_date"])
     print(df)
 
-    df.to_json('stock_data.json', orient='records', force_ascii=False)
+    changes = refresh_universe(build_universe(df))
+    for change, label in ((LISTED, '新上市'), (DELISTED, '退市'), (RENAMED, '改名')):
+        for row in changes[changes['change'] == change].itertuples():
+            names = row.new_name if change == LISTED else row.old_name if change == DELISTED else \
+                f"{row.old_name} -> {row.new_name}"
+            print(f"{label}: {row.ts_code} {names}")
 
-    print("数据已保存到stock_data.json文件中。")
+    print(f"股票池已更新，共{len(df)}只股票，变更{len(changes)}条。")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,206 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from detectors import MIN_DAILY_BARS
+
+# 排除标记，按位组合，与 detectors.is_excluded 的规则一致
+FLAG_ST = 1
+FLAG_BSE = 2
+FLAG_STAR = 4
+
+
+# 股票池变更类型
+LISTED = 'listed'
+DELISTED = 'delisted'
+RENAMED = 'renamed'
+
+
+def _resource_dir():
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resource')
+
+
+def _default_paths():
+    resource_dir = _resource_dir()
+    return os.path.join(resource_dir, 'stock_data.json'), os.path.join(resource_dir, 'universe.parquet')
+
+
+def _default_changes_path():
+    return os.path.join(_resource_dir(), 'universe_changes.jsonl')
+
+
+def exclusion_flags(ts_codes, names):
+    """按股票代码和名称计算排除标记，ts_codes / names 为Series"""
+    flags = np.zeros(len(ts_codes), dtype=np.uint8)
+    flags[names.str.contains('ST', regex=False).to_numpy(dtype=bool)] |= FLAG_ST
+    flags[ts_codes.str.startswith('8').to_numpy(dtype=bool)] |= FLAG_BSE
+    flags[ts_codes.str.startswith('688').to_numpy(dtype=bool)] |= FLAG_STAR
+    return flags
+
+
+def build_universe(stock_data):
+    """
+    将 stock_basic 的股票列表转为股票池：以ts_code为索引，保留原来的顺序
+
+    返回：
+        DataFrame，索引为ts_code，列为 name, market, list_date(YYYYMMDD，未知时为空字符串), flags
+    """
+    list_date = stock_data['list_date'] if 'list_date' in stock_data.columns else pd.Series('', index=stock_data.index)
+    universe = pd.DataFrame({
+        'ts_code': stock_data['ts_code'].astype(str),
+        'name': stock_data['name'].astype(str),
+        'market': stock_data['market'].fillna('').astype(str) if 'market' in stock_data.columns else '',
+        # read_json会把日期读成整数
+        'list_date': pd.to_numeric(list_date, errors='coerce').astype('Int64').astype(str).fillna(''),
+    })
+    universe['flags'] = exclusion_flags(universe['ts_code'], universe['name'])
+    universe['market'] = universe['market'].astype('category')
+    return universe.set_index('ts_code')
+
+
+def save_universe(universe, path=None):
+    path = path or _default_paths()[1]
+    tmp_path = path + '.tmp'
+    universe.reset_index().to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def load_universe(stock_data_path=None, universe_path=None):
+    """
+    读取股票池。stock_data.json 比 universe.parquet 新时重新生成，之后直接读取列式文件，不再解析JSON
+    """
+    default_json, default_parquet = _default_paths()
+    stock_data_path = stock_data_path or default_json
+    universe_path = universe_path or default_parquet
+
+    if os.path.exists(universe_path) and (not os.path.exists(stock_data_path)
+                                          or os.path.getmtime(universe_path) >= os.path.getmtime(stock_data_path)):
+        return pd.read_parquet(universe_path).set_index('ts_code')
+
+    universe = build_universe(pd.read_json(stock_data_path))
+    save_universe(universe, universe_path)
+    return universe
+
+
+def plan_universe(universe, as_of, min_bars=MIN_DAILY_BARS, skip=()):
+    """
+    在获取任何数据之前筛掉不可能命中任何检测的股票：
+        - excluded: ST、北交所、科创板
+        - too_new: 上市日到as_of之间的工作日少于min_bars（交易日不会多于工作日，因此不会误删）
+        - done: 在skip中的股票，例如恢复运行时已经处理过的股票
+
+    参数：
+        universe: load_universe 返回的股票池
+        as_of: 本次检测的交易日，格式YYYYMMDD
+        min_bars: 至少需要的日线数量，默认与检测引擎的 MIN_DAILY_BARS 相同
+    返回：
+        ([(ts_code, name), ...], {原因: 跳过的数量})
+    """
+    ts_codes = universe.index.to_numpy(dtype=object).astype(str)
+    excluded = universe['flags'].to_numpy() != 0
+
+    list_date = universe['list_date'].fillna('').to_numpy(dtype=object).astype(str)
+    known = list_date != ''
+    as_of_day = np.datetime64(f"{as_of[:4]}-{as_of[4:6]}-{as_of[6:]}") + 1
+    listed_days = np.full(len(universe), min_bars, dtype=np.int64)
+    if known.any():
+        dates = pd.to_datetime(list_date[known], format='%Y%m%d').to_numpy().astype('datetime64[D]')
+        listed_days[known] = np.busday_count(np.minimum(dates, as_of_day), as_of_day)
+    too_new = ~excluded & (listed_days < min_bars)
+
+    done = ~excluded & ~too_new & np.isin(ts_codes, list(skip))
+    keep = ~(excluded | too_new | done)
+    stocks = list(zip(ts_codes[keep].tolist(), universe['name'].to_numpy(dtype=object)[keep].tolist()))
+    return stocks, {'excluded': int(excluded.sum()), 'too_new': int(too_new.sum()), 'done': int(done.sum())}
+
+
+def diff_universe(old, new):
+    """
+    比较两个股票池
+
+    返回：
+        DataFrame，列为 change, ts_code, old_name, new_name, old_flags, new_flags：
+            - listed: 新上市（new中新增）
+            - delisted: 退市（new中不再出现）
+            - renamed: 名称或排除标记变化，例如名称加上了ST
+    """
+    listed = new.index.difference(old.index, sort=False)
+    delisted = old.index.difference(new.index, sort=False)
+    common = new.index.intersection(old.index, sort=False)
+    old_common, new_common = old.loc[common], new.loc[common]
+    changed = ((old_common['name'].to_numpy(dtype=object) != new_common['name'].to_numpy(dtype=object))
+               | (old_common['flags'].to_numpy() != new_common['flags'].to_numpy()))
+    renamed = common[changed]
+
+    def rows(change, codes, old_rows, new_rows):
+        return pd.DataFrame({
+            'change': change,
+            'ts_code': codes.to_numpy(dtype=object),
+            'old_name': old_rows['name'].to_numpy(dtype=object) if old_rows is not None else None,
+            'new_name': new_rows['name'].to_numpy(dtype=object) if new_rows is not None else None,
+            'old_flags': old_rows['flags'].to_numpy(dtype=object) if old_rows is not None else None,
+            'new_flags': new_rows['flags'].to_numpy(dtype=object) if new_rows is not None else None,
+        })
+
+    return pd.concat([
+        rows(LISTED, listed, None, new.loc[listed]),
+        rows(DELISTED, delisted, old.loc[delisted], None),
+        rows(RENAMED, renamed, old.loc[renamed], new.loc[renamed]),
+    ], ignore_index=True)
+
+
+def refresh_universe(new, universe_path=None, changes_path=None, stock_data_path=None):
+    """
+    用最新的股票列表增量更新股票池：与已保存的股票池比较，把变更追加到变更日志，股票池有变化时才重新写入快照
+
+    参数：
+        new: build_universe 生成的最新股票池
+    返回：
+        diff_universe 的结果，第一次生成股票池时为空（不把全部股票记为新上市）
+    """
+    default_json, default_parquet = _default_paths()
+    universe_path = universe_path or default_parquet
+    changes_path = changes_path or _default_changes_path()
+    stock_data_path = stock_data_path or default_json
+
+    if os.path.exists(universe_path) or os.path.exists(stock_data_path):
+        old = load_universe(stock_data_path, universe_path)
+        changes = diff_universe(old, new)
+    else:
+        old = None
+        changes = diff_universe(new.iloc[:0], new.iloc[:0])
+
+    # 名称和排除标记以外的字段（板块、上市日期）变化时也需要重新写入快照
+    unchanged = (old is not None and changes.empty and old.index.equals(new.index)
+                 and (old[['market', 'list_date']].astype(str).to_numpy()
+                      == new[['market', 'list_date']].astype(str).to_numpy()).all())
+    if not unchanged:
+        save_universe(new, universe_path)
+
+    if not changes.empty:
+        records = changes.assign(time=datetime.now().strftime('%Y-%m-%d %H:%M:%S')).to_dict(orient='records')
+        with open(changes_path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=int) + '\n')
+    return changes
+
+
+def load_changes(since=None, path=None):
+    """
+    读取股票池变更日志，下游缓存可以据此只失效受影响的股票
+
+    参数：
+        since: 只返回该时间之后的变更，格式 YYYY-MM-DD HH:MM:SS
+    返回：
+        DataFrame，列与 diff_universe 相同，另有变更时间 time
+    """
+    path = path or _default_changes_path()
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=['change', 'ts_code', 'old_name', 'new_name', 'old_flags', 'new_flags', 'time'])
+    changes = pd.read_json(path, lines=True, dtype={'ts_code': str, 'time': str})
+    if since is not None:
+        changes = changes[changes['time'] > since]
+    return changes.reset_index(drop=True)